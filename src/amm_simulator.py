@@ -8,31 +8,58 @@ Uniswap V3 風格的 AMM 模擬器
 3. 正確計算手續費
 """
 import math
-from typing import Dict, List, Optional, Tuple
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
 from dataclasses import dataclass, field
-from decimal import Decimal, getcontext
 
 try:
     from .uniswap_v3_math import (
         tick_to_sqrt_price, sqrt_price_to_price,
         get_amounts_from_liquidity, get_liquidity_from_amounts,
-        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS
+        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS, MAX_TICK
     )
 except ImportError:
     from uniswap_v3_math import (
         tick_to_sqrt_price, sqrt_price_to_price,
         get_amounts_from_liquidity, get_liquidity_from_amounts,
-        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS
+        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS, MAX_TICK
     )
 
-getcontext().prec = 50
-
 Q96 = 2 ** 96
 Q128 = 2 ** 128
 FEE_TIER = 3000  # 0.3%
 
+_LOG_1_0001 = math.log(1.0001)
+# 2^-96 是精確的 2 的冪，乘以它與除以 Q96 結果完全相同
+_INV_Q96 = 1.0 / float(1 << 96)
+# 合約單位 → 實際單位的換算因子（乘法代替每次的 10 ** decimals 除法）
+_INV_SCALE0 = 1.0 / (10 ** TOKEN0_DECIMALS)
+_INV_SCALE1 = 1.0 / (10 ** TOKEN1_DECIMALS)
+
+
+def _sqrt_price_x96_to_display_price(sqrt_price_x96: int) -> float:
+    """sqrtPriceX96 → 顯示價格 (USDC per WBTC)，供熱路徑直接調用"""
+    if sqrt_price_x96 <= 0:
+        return 0.0
+    sqrt_price = float(sqrt_price_x96) * _INV_Q96
+    return sqrt_price * sqrt_price * PRICE_SCALE
+
+
+@lru_cache(maxsize=16384)
+def _tick_to_raw_price(tick: int) -> float:
+    """1.0001^tick（不含 PRICE_SCALE），溢出時夾到 1e20 / 1e-20"""
+    try:
+        result = math.exp(tick * _LOG_1_0001)
+        if math.isinf(result) or math.isnan(result):
+            return 1e20 if tick > 0 else 1e-20
+        return result
+    except (OverflowError, ValueError):
+        return 1e20 if tick > 0 else 1e-20
+
 
-@dataclass
+@dataclass(slots=True)
 class LiquidityPosition:
     """LP 流動性位置"""
     owner: str
@@ -47,9 +74,12 @@ class LiquidityPosition:
     # 累積的手續費（待提取）
     tokens_owed0: int = 0
     tokens_owed1: int = 0
+    # tick 邊界在位置生命週期內不變，創建時預先計算 sqrt price
+    sqrt_price_lower_cache: float = 0.0
+    sqrt_price_upper_cache: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class PoolState:
     """池子狀態"""
     sqrt_price_x96: int
@@ -57,7 +87,9 @@ class PoolState:
     liquidity: int  # 池子總活躍流動性
     fee_growth_global0_x128: int = 0  # Q128 格式的累積手續費
     fee_growth_global1_x128: int = 0
-    positions: Dict[str, List[LiquidityPosition]] = field(default_factory=dict)
+    # 所有位置存於單一扁平列表；owner -> 索引映射只用於按 owner 的查詢
+    positions_flat: List[LiquidityPosition] = field(default_factory=list)
+    owner_to_indices: Dict[str, List[int]] = field(default_factory=dict)
 
 
 class AMMSimulator:
@@ -67,7 +99,24 @@ class AMMSimulator:
         self.fee_tier = fee_tier
         self.fee_rate = fee_tier / 1_000_000  # 0.003 = 0.3%
         self.pool_state: Optional[PoolState] = None
-        self.price_history: List[Tuple[int, float]] = []
+        # 價格歷史以兩個緊湊列存儲（每筆 16 bytes），避免每個 swap 創建 tuple
+        self.price_timestamps: array = array('q')
+        self.price_values: array = array('d')
+        # 當前 tick 下在範圍內的位置；tick 停留在 [lower, upper) 內時集合不變
+        self._active_positions: List[LiquidityPosition] = []
+        self._active_tick_lower: int = 0
+        self._active_tick_upper: int = 0
+        self._active_positions_valid: bool = False
+        # 按 tick_lower 排序的位置索引與所有邊界的有序列表，僅在位置變動時重建
+        self._sorted_positions: List[LiquidityPosition] = []
+        self._sorted_tick_lowers: List[int] = []
+        self._tick_boundaries: List[int] = []
+        self._position_index_valid: bool = False
+    
+    @property
+    def price_history(self) -> List[Tuple[int, float]]:
+        """價格歷史 [(timestamp, price), ...]（向後兼容視圖，每次調用都會重新構建）"""
+        return list(zip(self.price_timestamps, self.price_values))
         
     def initialize_pool(self, sqrt_price_x96: int, tick: int, liquidity: int = 0, timestamp: int = 0):
         """初始化池子"""
@@ -76,10 +125,14 @@ class AMMSimulator:
             tick=tick,
             liquidity=liquidity
         )
+        self._invalidate_positions()
+        # 池子已初始化：之後的 swap 直接走無初始化檢查的版本
+        self.process_swap = self._process_swap_initialized
         price = self._sqrt_price_x96_to_price(sqrt_price_x96)
         # 只有在有有效時間戳時才記錄（避免從 1970 開始）
         if timestamp > 0:
-            self.price_history.append((timestamp, price))
+            self.price_timestamps.append(timestamp)
+            self.price_values.append(price)
         
     def _sqrt_price_x96_to_price(self, sqrt_price_x96: int) -> float:
         """將 sqrtPriceX96 轉換為顯示價格 (USDC per WBTC)
@@ -88,34 +141,23 @@ class AMMSimulator:
         price = (sqrtPriceX96 / 2^96)^2
         display_price = price * PRICE_SCALE
         """
-        if sqrt_price_x96 <= 0:
-            return 0.0
-        sqrt_price = float(sqrt_price_x96) / Q96
-        price = (sqrt_price ** 2) * PRICE_SCALE
-        return price
+        return _sqrt_price_x96_to_display_price(sqrt_price_x96)
     
     def _tick_to_price(self, tick: int) -> float:
         """將 tick 轉換為原始價格（不含 PRICE_SCALE）"""
-        try:
-            log_base = math.log(1.0001)
-            result = math.exp(tick * log_base)
-            if math.isinf(result) or math.isnan(result):
-                return 1e20 if tick > 0 else 1e-20
-            return result
-        except (OverflowError, ValueError):
-            return 1e20 if tick > 0 else 1e-20
+        return _tick_to_raw_price(tick)
     
     def get_current_price(self) -> float:
         """獲取當前顯示價格 (USDC per WBTC)"""
         if not self.pool_state:
             return 0.0
-        return self._sqrt_price_x96_to_price(self.pool_state.sqrt_price_x96)
+        return _sqrt_price_x96_to_display_price(self.pool_state.sqrt_price_x96)
     
     def get_sqrt_price(self) -> float:
         """獲取當前 sqrt_price（原始值，不含 Q96）"""
         if not self.pool_state:
             return 0.0
-        return float(self.pool_state.sqrt_price_x96) / Q96
+        return float(self.pool_state.sqrt_price_x96) * _INV_Q96
     
     def add_liquidity(
         self,
@@ -131,11 +173,12 @@ class AMMSimulator:
         if not self.pool_state:
             raise ValueError("Pool not initialized")
         
-        if owner not in self.pool_state.positions:
-            self.pool_state.positions[owner] = []
+        positions_flat = self.pool_state.positions_flat
+        indices = self.pool_state.owner_to_indices.setdefault(owner, [])
         
         # 檢查是否已存在相同範圍的位置
-        for pos in self.pool_state.positions[owner]:
+        for idx in indices:
+            pos = positions_flat[idx]
             if pos.tick_lower == tick_lower and pos.tick_upper == tick_upper:
                 # 先結算現有手續費
                 self._collect_fees_for_position(pos)
@@ -143,6 +186,7 @@ class AMMSimulator:
                 pos.liquidity += liquidity
                 pos.amount0 += amount0
                 pos.amount1 += amount1
+                self._invalidate_positions()
                 return pos
         
         # 創建新位置
@@ -155,9 +199,13 @@ class AMMSimulator:
             amount1=amount1,
             # 記錄創建時的 fee_growth（作為未來計算的基準）
             fee_growth_inside0_last=self.pool_state.fee_growth_global0_x128,
-            fee_growth_inside1_last=self.pool_state.fee_growth_global1_x128
+            fee_growth_inside1_last=self.pool_state.fee_growth_global1_x128,
+            sqrt_price_lower_cache=tick_to_sqrt_price(tick_lower),
+            sqrt_price_upper_cache=tick_to_sqrt_price(tick_upper)
         )
-        self.pool_state.positions[owner].append(pos)
+        indices.append(len(positions_flat))
+        positions_flat.append(pos)
+        self._invalidate_positions()
         
         # 如果價格在範圍內，增加池子活躍流動性
         if tick_lower <= self.pool_state.tick < tick_upper:
@@ -179,10 +227,13 @@ class AMMSimulator:
         if not self.pool_state:
             return (0, 0, 0, 0)
         
-        if owner not in self.pool_state.positions:
+        indices = self.pool_state.owner_to_indices.get(owner)
+        if not indices:
             return (0, 0, 0, 0)
         
-        for pos in self.pool_state.positions[owner]:
+        positions_flat = self.pool_state.positions_flat
+        for idx in indices:
+            pos = positions_flat[idx]
             if pos.tick_lower == tick_lower and pos.tick_upper == tick_upper:
                 if pos.liquidity < liquidity:
                     liquidity = pos.liquidity
@@ -192,8 +243,8 @@ class AMMSimulator:
                 
                 # 計算移除流動性對應的 token 數量
                 sqrt_price_current = self.get_sqrt_price()
-                sqrt_price_lower = tick_to_sqrt_price(tick_lower)
-                sqrt_price_upper = tick_to_sqrt_price(tick_upper)
+                sqrt_price_lower = pos.sqrt_price_lower_cache or tick_to_sqrt_price(tick_lower)
+                sqrt_price_upper = pos.sqrt_price_upper_cache or tick_to_sqrt_price(tick_upper)
                 
                 amount0, amount1 = get_amounts_from_liquidity(
                     liquidity=liquidity,
@@ -216,6 +267,7 @@ class AMMSimulator:
                 
                 # 更新位置
                 pos.liquidity -= liquidity
+                self._invalidate_positions()
                 pos.tokens_owed0 -= fee0
                 pos.tokens_owed1 -= fee1
                 
@@ -245,6 +297,11 @@ class AMMSimulator:
         if not (pos.tick_lower <= self.pool_state.tick < pos.tick_upper):
             return (pos.tokens_owed0, pos.tokens_owed1)
         
+        # 自上次結算後沒有新的手續費（例如同一 swap 後的估值查詢），無需重新計算
+        if (self.pool_state.fee_growth_global0_x128 == pos.fee_growth_inside0_last
+                and self.pool_state.fee_growth_global1_x128 == pos.fee_growth_inside1_last):
+            return (pos.tokens_owed0, pos.tokens_owed1)
+        
         # 計算從上次更新到現在的手續費增量
         fee_growth_delta0 = self.pool_state.fee_growth_global0_x128 - pos.fee_growth_inside0_last
         fee_growth_delta1 = self.pool_state.fee_growth_global1_x128 - pos.fee_growth_inside1_last
@@ -256,8 +313,9 @@ class AMMSimulator:
         
         # 計算理論手續費
         # tokensOwed = L * feeGrowthDelta / Q128
-        raw_fee0 = (pos.liquidity * fee_growth_delta0) // Q128
-        raw_fee1 = (pos.liquidity * fee_growth_delta1) // Q128
+        # 兩者皆非負，右移 128 位等價於 // Q128，但省去大整數除法
+        raw_fee0 = (pos.liquidity * fee_growth_delta0) >> 128
+        raw_fee1 = (pos.liquidity * fee_growth_delta1) >> 128
         
         # 關鍵：限制手續費到合理範圍
         # 假設我們的 $10,000 投入只佔池子的 0.01%
@@ -281,6 +339,80 @@ class AMMSimulator:
         
         return (pos.tokens_owed0, pos.tokens_owed1)
     
+    def _invalidate_positions(self):
+        """位置集合變動後，標記排序索引與活躍集合需要重建"""
+        self._position_index_valid = False
+        self._active_positions_valid = False
+    
+    def _rebuild_position_index(self):
+        """按 tick_lower 排序所有有效位置，並收集有序的邊界 tick 列表"""
+        live = [pos for pos in self.pool_state.positions_flat if pos.liquidity > 0]
+        live.sort(key=lambda pos: pos.tick_lower)
+        boundaries = set()
+        for pos in live:
+            boundaries.add(pos.tick_lower)
+            boundaries.add(pos.tick_upper)
+        
+        self._sorted_positions = live
+        self._sorted_tick_lowers = [pos.tick_lower for pos in live]
+        self._tick_boundaries = sorted(boundaries)
+        self._position_index_valid = True
+    
+    def _refresh_active_positions(self):
+        """重建當前 tick 下的活躍位置集合
+        
+        同時記錄集合保持不變的 tick 區間 [lower, upper)：即當前 tick 兩側
+        最近的位置邊界。只有 tick 跨出該區間或位置變動時才需要重建。
+        邊界與候選位置均通過二分查找定位，無需遍歷全部位置。
+        """
+        if not self._position_index_valid:
+            self._rebuild_position_index()
+        
+        tick = self.pool_state.tick
+        # tick_lower <= tick 的位置構成有序前綴，只需再檢查 tick_upper
+        k = bisect_right(self._sorted_tick_lowers, tick)
+        active = [pos for pos in self._sorted_positions[:k] if tick < pos.tick_upper]
+        
+        boundaries = self._tick_boundaries
+        j = bisect_right(boundaries, tick)
+        
+        self._active_positions = active
+        self._active_tick_lower = boundaries[j - 1] if j > 0 else -MAX_TICK - 1
+        self._active_tick_upper = boundaries[j] if j < len(boundaries) else MAX_TICK + 1
+        self._active_positions_valid = True
+    
+    def _accrue_position_fees(self):
+        """一次遍歷為所有在範圍內的位置累積手續費
+        
+        結果與逐個調用 _collect_fees_for_position 相同，但全局 fee_growth
+        每次 swap 只讀取一次，手續費計算直接內聯，省去每個位置的方法調用。
+        只遍歷活躍位置集合，跨越位置邊界時才重建該集合。
+        """
+        state = self.pool_state
+        if not (self._active_positions_valid
+                and self._active_tick_lower <= state.tick < self._active_tick_upper):
+            self._refresh_active_positions()
+        
+        fee_growth0 = state.fee_growth_global0_x128
+        fee_growth1 = state.fee_growth_global1_x128
+        
+        for pos in self._active_positions:
+            fee_growth_delta0 = fee_growth0 - pos.fee_growth_inside0_last
+            fee_growth_delta1 = fee_growth1 - pos.fee_growth_inside1_last
+            if fee_growth_delta0 < 0:
+                fee_growth_delta0 = 0
+            if fee_growth_delta1 < 0:
+                fee_growth_delta1 = 0
+            
+            # 與 _collect_fees_for_position 相同的上限（每次最多 amount 的 0.001%）
+            pos.tokens_owed0 += min((pos.liquidity * fee_growth_delta0) >> 128,
+                                    max(1, pos.amount0 // 100000))
+            pos.tokens_owed1 += min((pos.liquidity * fee_growth_delta1) >> 128,
+                                    max(1, pos.amount1 // 100000))
+            
+            pos.fee_growth_inside0_last = fee_growth0
+            pos.fee_growth_inside1_last = fee_growth1
+    
     def process_swap(
         self,
         amount0: int,
@@ -290,54 +422,114 @@ class AMMSimulator:
         liquidity: int,
         timestamp: int
     ):
-        """處理 Swap 事件"""
+        """處理 Swap 事件
+        
+        只在池子未初始化時被調用：首個 swap 用於初始化池子，initialize_pool
+        隨後將實例上的 process_swap 綁定為 _process_swap_initialized。
+        """
         if not self.pool_state:
             self.initialize_pool(sqrt_price_x96, tick, liquidity, timestamp)
             return
-        
+        self._process_swap_initialized(amount0, amount1, sqrt_price_x96, tick, liquidity, timestamp)
+    
+    def _process_swap_initialized(
+        self,
+        amount0: int,
+        amount1: int,
+        sqrt_price_x96: int,
+        tick: int,
+        liquidity: int,
+        timestamp: int
+    ):
+        """處理 Swap 事件（池子已初始化）"""
         # 計算手續費
         # Uniswap V3: fee 是從輸入扣除的
-        fee_amount0 = 0
-        fee_amount1 = 0
-        
-        if amount0 > 0 and amount1 < 0:
-            # 用戶賣出 token1，買入 token0
-            input_amount = abs(amount1)
-            fee_amount1 = int(input_amount * self.fee_rate)
-        elif amount1 > 0 and amount0 < 0:
-            # 用戶賣出 token0，買入 token1
-            input_amount = abs(amount0)
-            fee_amount0 = int(input_amount * self.fee_rate)
+        # 負的 amount 視為輸入方向，另一方向的輸入為 0，因此無需分支判斷
+        fee_amount0 = int(max(0, -amount0) * self.fee_rate)
+        fee_amount1 = int(max(0, -amount1) * self.fee_rate)
         
         # 更新 fee_growth_global
         # fee_growth = fee * Q128 / liquidity
         # 關鍵：使用事件中的 liquidity（整個池子的活躍流動性）
         # 而不是 self.pool_state.liquidity（只有我們的位置）
         # 這樣手續費會按比例正確分配
-        active_liquidity = liquidity if liquidity > 0 else self.pool_state.liquidity
+        state = self.pool_state
+        active_liquidity = liquidity if liquidity > 0 else state.liquidity
         
         if active_liquidity > 0:
             if fee_amount0 > 0:
                 delta = (fee_amount0 * Q128) // active_liquidity
-                self.pool_state.fee_growth_global0_x128 += delta
+                state.fee_growth_global0_x128 += delta
             if fee_amount1 > 0:
                 delta = (fee_amount1 * Q128) // active_liquidity
-                self.pool_state.fee_growth_global1_x128 += delta
+                state.fee_growth_global1_x128 += delta
         
         # 更新所有在範圍內的位置的手續費
-        for owner, positions in self.pool_state.positions.items():
-            for pos in positions:
-                if pos.liquidity > 0:
-                    if pos.tick_lower <= self.pool_state.tick < pos.tick_upper:
-                        self._collect_fees_for_position(pos)
+        self._accrue_position_fees()
         
         # 更新池子狀態
-        self.pool_state.sqrt_price_x96 = sqrt_price_x96
-        self.pool_state.tick = tick
+        state.sqrt_price_x96 = sqrt_price_x96
+        state.tick = tick
         
         # 記錄價格歷史
-        price = self._sqrt_price_x96_to_price(sqrt_price_x96)
-        self.price_history.append((timestamp, price))
+        self.price_timestamps.append(timestamp)
+        self.price_values.append(_sqrt_price_x96_to_display_price(sqrt_price_x96))
+    
+    def process_swaps(
+        self,
+        amounts0: Sequence[int],
+        amounts1: Sequence[int],
+        sqrt_prices_x96: Sequence[int],
+        ticks: Sequence[int],
+        liquidities: Sequence[int],
+        timestamps: Sequence[int]
+    ):
+        """批量處理一段連續的 Swap 事件
+        
+        結果與按順序逐筆調用 process_swap 相同。全局 fee_growth 在局部變量中累加，
+        池中沒有有效位置時跳過逐位置的手續費更新，價格歷史一次性寫入。
+        """
+        n = len(timestamps)
+        if n == 0:
+            return
+        
+        start = 0
+        if not self.pool_state:
+            self.initialize_pool(sqrt_prices_x96[0], ticks[0], liquidities[0], timestamps[0])
+            start = 1
+        
+        state = self.pool_state
+        fee_rate = self.fee_rate
+        accrue = self._accrue_position_fees
+        has_positions = any(pos.liquidity > 0 for pos in state.positions_flat)
+        fee_growth0 = state.fee_growth_global0_x128
+        fee_growth1 = state.fee_growth_global1_x128
+        
+        for i in range(start, n):
+            fee_amount0 = int(max(0, -amounts0[i]) * fee_rate)
+            fee_amount1 = int(max(0, -amounts1[i]) * fee_rate)
+            
+            active_liquidity = liquidities[i] if liquidities[i] > 0 else state.liquidity
+            if active_liquidity > 0:
+                if fee_amount0 > 0:
+                    fee_growth0 += (fee_amount0 * Q128) // active_liquidity
+                if fee_amount1 > 0:
+                    fee_growth1 += (fee_amount1 * Q128) // active_liquidity
+            
+            if has_positions:
+                # 位置的手續費按 swap 前的 tick 逐筆結算（每筆有上限，不能合併）
+                state.fee_growth_global0_x128 = fee_growth0
+                state.fee_growth_global1_x128 = fee_growth1
+                accrue()
+            
+            state.tick = ticks[i]
+        
+        state.fee_growth_global0_x128 = fee_growth0
+        state.fee_growth_global1_x128 = fee_growth1
+        state.sqrt_price_x96 = sqrt_prices_x96[n - 1]
+        
+        self.price_timestamps.extend(timestamps[start:])
+        self.price_values.extend(map(_sqrt_price_x96_to_display_price, sqrt_prices_x96[start:]))
     
     def calculate_position_value(
         self,
@@ -353,8 +545,8 @@ class AMMSimulator:
         
         # 計算 token 數量
         sqrt_price_current = self.get_sqrt_price()
-        sqrt_price_lower = tick_to_sqrt_price(position.tick_lower)
-        sqrt_price_upper = tick_to_sqrt_price(position.tick_upper)
+        sqrt_price_lower = position.sqrt_price_lower_cache or tick_to_sqrt_price(position.tick_lower)
+        sqrt_price_upper = position.sqrt_price_upper_cache or tick_to_sqrt_price(position.tick_upper)
         
         amount0, amount1 = get_amounts_from_liquidity(
             liquidity=position.liquidity,
@@ -367,16 +559,16 @@ class AMMSimulator:
         )
         
         # 轉換為實際單位
-        wbtc = float(amount0) / (10 ** TOKEN0_DECIMALS)
-        usdc = float(amount1) / (10 ** TOKEN1_DECIMALS)
+        wbtc = float(amount0) * _INV_SCALE0
+        usdc = float(amount1) * _INV_SCALE1
         
         # 計算價值
         value_usdc = wbtc * current_price + usdc
         
         # 計算未提取的手續費
         self._collect_fees_for_position(position)
-        fee_wbtc = float(position.tokens_owed0) / (10 ** TOKEN0_DECIMALS)
-        fee_usdc = float(position.tokens_owed1) / (10 ** TOKEN1_DECIMALS)
+        fee_wbtc = float(position.tokens_owed0) * _INV_SCALE0
+        fee_usdc = float(position.tokens_owed1) * _INV_SCALE1
         fees_usdc = fee_wbtc * current_price + fee_usdc
         
         return (wbtc, value_usdc, fees_usdc)
@@ -384,6 +576,6 @@ class AMMSimulator:
     def get_position_fees(self, position: LiquidityPosition) -> Tuple[float, float]:
         """獲取位置的累積手續費"""
         self._collect_fees_for_position(position)
-        fee_wbtc = float(position.tokens_owed0) / (10 ** TOKEN0_DECIMALS)
-        fee_usdc = float(position.tokens_owed1) / (10 ** TOKEN1_DECIMALS)
+        fee_wbtc = float(position.tokens_owed0) * _INV_SCALE0
+        fee_usdc = float(position.tokens_owed1) * _INV_SCALE1
         return (fee_wbtc, fee_usdc)
@@ -7,120 +7,210 @@ Impermanent Loss (IL) 分析腳本
 import os
 import sys
 import csv
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from decimal import Decimal
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
+import matplotlib as mpl
+mpl.use('Agg')  # 只輸出圖片文件，使用無界面後端
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib import font_manager
 import numpy as np
 
+# 圖表輸出 DPI：默認 300（發佈品質），開發時可設 IL_CHART_DPI=100 加快出圖
+IL_CHART_DPI = int(os.environ.get('IL_CHART_DPI', '300'))
+# 低 DPI 預覽時省去 bbox_inches='tight' 的額外一次繪製
+_SAVEFIG_KWARGS = {'bbox_inches': 'tight'} if IL_CHART_DPI >= 200 else {}
+
+# 圖表樣式只在模組載入時解析一次，避免每次生成圖表都重新套用 rcParams
+plt.style.use('seaborn-v0_8-darkgrid')
+mpl.rcParams['savefig.dpi'] = IL_CHART_DPI
+
+# Color palette
+IL_COLORS = {
+    'Omnis AI (ATR)': '#2E86AB',
+    'Charm Alpha Vault': '#A23B72',
+    'Steer Classic Rebalance': '#F18F01',
+    'Steer Elastic Expansion': '#C73E1D',
+}
+DEFAULT_COLOR = '#666666'
+
+# (timestamp, lp_value, hodl_value, il_pct) 記錄的結構化 dtype，用於 np.fromiter 直接預分配
+IL_RECORD_DTYPE = np.dtype([('ts', np.int64), ('lp', np.float64), ('hodl', np.float64), ('il', np.float64)])
+
+# IL 合理範圍（%），超出視為計算異常並在 calculate_il_time_series 中過濾
+IL_MIN = -100.0
+IL_MAX = 100.0
+
+# 每個策略的折線樣式預先構建，繪圖時直接展開
+DEFAULT_STYLE = dict(color=DEFAULT_COLOR, linewidth=2, alpha=0.8)
+STYLE = {name: dict(color=color, linewidth=2, alpha=0.8) for name, color in IL_COLORS.items()}
+LEGEND_STYLE = dict(fontsize=10, framealpha=0.9)
+
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from output_generator import iter_local_datetimes
 from strategies.strategy_backtest import StrategyBacktester, BacktestConfig, BacktestResult
 from strategies.charm_strategy import CharmAlphaVaultStrategy
 from strategies.steer_strategy import SteerClassicStrategy, SteerElasticStrategy
 
 
-def load_value_history(filepath: str) -> List[Tuple[int, float]]:
-    """從 CSV 載入價值歷史"""
-    history = []
+def _npz_sidecar_path(csv_path: str) -> str:
+    """IL CSV 對應的 .npz 二進制副本路徑（ts / lp / hodl / il 四列，供下游腳本直接 np.load）"""
+    return os.path.splitext(csv_path)[0] + '.npz'
+
+
+def _load_csv_columns(filepath: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    用 NumPy 一次性解析 CSV 的第 0 列（時間戳）和第 2 列（數值）
+    
+    列數不足或無法解析的行會被跳過，與逐行 csv.reader + try/except 的行為一致。
+    
+    Returns:
+        (timestamps int64, values float64)
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
     if not os.path.exists(filepath):
-        return history
+        return empty
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header
-        for row in reader:
-            if len(row) >= 3:
-                try:
-                    ts = int(float(row[0]))
-                    value = float(row[2])
-                    history.append((ts, value))
-                except:
-                    continue
-    return history
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        data = np.genfromtxt(
+            filepath, delimiter=',', skip_header=1, usecols=(0, 2),
+            dtype=np.float64, invalid_raise=False, encoding='utf-8', ndmin=2
+        )
+    if data.size == 0:
+        return empty
+    
+    data = data[~np.isnan(data).any(axis=1)]
+    return data[:, 0].astype(np.int64), data[:, 1]
 
 
-def load_price_history(filepath: str) -> List[Tuple[int, float]]:
-    """從 CSV 載入價格歷史"""
-    history = []
-    if not os.path.exists(filepath):
-        return history
+def load_value_history(filepath: str) -> Tuple[np.ndarray, np.ndarray]:
+    """從 CSV 載入價值歷史，返回 (timestamps, values) 數組"""
+    return _load_csv_columns(filepath)
+
+
+def load_price_history(filepath: str) -> Tuple[np.ndarray, np.ndarray]:
+    """從 CSV 載入價格歷史，返回 (timestamps, prices) 數組"""
+    return _load_csv_columns(filepath)
+
+
+def _nearest_price_indices(price_ts: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+    """
+    批量查找最接近每個時間戳的價格索引（price_ts 需已按時間排序）
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header
-        for row in reader:
-            if len(row) >= 3:
-                try:
-                    ts = int(float(row[0]))
-                    price = float(row[2])
-                    history.append((ts, price))
-                except:
-                    continue
-    return history
+    距離相同時取較早的價格；同一時間戳有多筆價格時取最後一筆，
+    與原先 dict 索引 + min() 線性掃描的結果一致。
+    """
+    n = len(price_ts)
+    right = np.searchsorted(price_ts, timestamps, side='right')
+    left = np.clip(right - 1, 0, n - 1)      # 最後一個 <= ts 的位置
+    right_c = np.clip(right, 0, n - 1)       # 第一個 > ts 的位置
+    use_right = (right == 0) | (
+        (right < n) & (price_ts[right_c] - timestamps < timestamps - price_ts[left])
+    )
+    idx = np.where(use_right, right_c, left)
+    # 重複時間戳統一取最後一筆
+    return np.searchsorted(price_ts, price_ts[idx], side='right') - 1
 
 
 def calculate_il_time_series(
-    value_history: List[Tuple[int, Decimal]],
-    price_history: List[Tuple[int, float]],
+    value_ts: np.ndarray,
+    value_f64: np.ndarray,
+    price_ts: np.ndarray,
+    price_val: np.ndarray,
     initial_amount0: Decimal,
     initial_amount1: Decimal,
-    initial_price: float
+    initial_price: float,
+    il_min: float = IL_MIN,
+    il_max: float = IL_MAX
 ) -> List[Tuple[int, float, float, float]]:
     """
     計算 IL 時間序列
     
+    value_ts / value_f64 為 LP 價值歷史（float，無需 Decimal 往返轉換）；
+    price_ts / price_val 為按時間排序的價格索引（見 run_il_analysis）
+    
+    返回的序列保證 il_min <= il_pct <= il_max，下游無需再次過濾。
+    
     Returns:
         List of (timestamp, lp_value, hodl_value, il_pct)
     """
-    il_series = []
-    
-    # 建立價格索引（快速查找）
-    price_dict = {ts: price for ts, price in price_history}
-    
-    for ts, lp_value_decimal in value_history:
-        # 找到對應的價格
-        current_price = None
-        if ts in price_dict:
-            current_price = price_dict[ts]
-        else:
-            # 找最接近的價格
-            closest_ts = min(price_history, key=lambda x: abs(x[0] - ts))[0]
-            current_price = price_dict[closest_ts]
-        
-        if current_price is None or current_price <= 0:
-            continue
-        
-        # 計算 HODL 價值
-        hodl_value = float(initial_amount0) * current_price + float(initial_amount1)
-        lp_value = float(lp_value_decimal)
-        
-        # 計算 IL (%)
-        if hodl_value > 0:
-            il_pct = ((lp_value - hodl_value) / hodl_value) * 100
-        else:
-            il_pct = 0.0
-        
-        # 過濾異常值：IL 應該在合理範圍內（-100% 到 +100%）
-        # 如果超出範圍，可能是計算錯誤，跳過或限制
-        if il_pct > 100 or il_pct < -100:
-            # 跳過明顯異常的數據點
-            continue
-        
-        il_series.append((ts, lp_value, hodl_value, il_pct))
+    if len(value_f64) == 0 or len(price_ts) == 0:
+        return []
     
-    return il_series
+    # 用 searchsorted 查找最近價格
+    ts_arr = np.asarray(value_ts, dtype=np.int64)
+    lp_arr = np.asarray(value_f64, dtype=np.float64)
+    
+    prices = price_val[_nearest_price_indices(price_ts, ts_arr)]
+    
+    # 計算 HODL 價值
+    hodl = float(initial_amount0) * prices + float(initial_amount1)
+    
+    # 計算 IL (%)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        il = np.where(hodl > 0, ((lp_arr - hodl) / hodl) * 100, 0.0)
+    
+    # 跳過無效價格；過濾異常值：IL 應該在合理範圍內（默認 -100% 到 +100%）
+    mask = (prices > 0) & (il >= il_min) & (il <= il_max)
+    
+    return list(zip(ts_arr[mask].tolist(), lp_arr[mask].tolist(),
+                    hodl[mask].tolist(), il[mask].tolist()))
+
+
+def clean_il_arrays(
+    il_data: Dict[str, List[Tuple[int, float, float, float]]]
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    將每個策略的 IL 序列轉為 (timestamps, il_pct) 數組，空序列不包含在結果中。
+    
+    IL 序列已由 calculate_il_time_series 過濾異常值，這裡不再重複過濾。
+    """
+    clean: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for name, il_series in il_data.items():
+        if not il_series:
+            continue
+        data = np.fromiter(il_series, dtype=IL_RECORD_DTYPE, count=len(il_series))
+        clean[name] = (data['ts'].copy(), data['il'].copy())
+    return clean
+
+
+# 子進程內的回測器，由 _init_strategy_worker 在進程啟動時設置一次
+_worker_backtester: Optional[StrategyBacktester] = None
+
+
+def _init_strategy_worker(
+    config: BacktestConfig,
+    tick_history: List[Tuple[int, int]],
+    price_history: List[Tuple[int, float]]
+):
+    """進程池初始化：直接使用主進程已載入的 tick / 價格歷史，子進程不再重新解析數據文件"""
+    global _worker_backtester
+    _worker_backtester = StrategyBacktester(config)
+    _worker_backtester.tick_history = tick_history
+    _worker_backtester.price_history = price_history
+
+
+def _run_strategy_backtest(strategy) -> BacktestResult:
+    """在子進程中運行單個策略回測（模組級函數，以便 ProcessPoolExecutor pickle）"""
+    return _worker_backtester.run_backtest(strategy)
 
 
 def run_il_analysis(
     data_file: str,
     initial_capital: float = 10000.0,
-    output_dir: str = "output/all_compare"
+    output_dir: str = "output/all_compare",
+    use_multiprocessing: bool = True
 ):
-    """運行 IL 分析"""
+    """運行 IL 分析
+    
+    use_multiprocessing: 各策略回測互相獨立，默認每個策略在單獨進程中並行運行（單核時順序運行）
+    """
     
     print("=" * 70)
     print("Impermanent Loss (IL) 分析")
@@ -139,10 +229,9 @@ def run_il_analysis(
     backtester.load_tick_data(data_file)
     
     # Get market info
-    first_price = backtester.price_history[0][1]
-    last_price = backtester.price_history[-1][1]
-    first_ts = backtester.price_history[0][0]
-    last_ts = backtester.price_history[-1][0]
+    ph = backtester.price_history
+    first_ts, first_price = ph[0]
+    last_ts, last_price = ph[-1]
     
     first_date = datetime.fromtimestamp(first_ts).strftime('%Y-%m-%d')
     last_date = datetime.fromtimestamp(last_ts).strftime('%Y-%m-%d')
@@ -186,28 +275,55 @@ def run_il_analysis(
     
     results: Dict[str, BacktestResult] = {}
     
-    for strategy in strategies:
-        name = strategy.name
-        print(f"\n運行 {name}...")
-        try:
-            result = backtester.run_backtest(strategy)
-            results[name] = result
-            print(f"  ✓ 完成: IL={result.impermanent_loss_pct:.2f}%")
-        except Exception as e:
-            print(f"  ✗ 錯誤: {e}")
-            import traceback
-            traceback.print_exc()
+    cpu_count = os.cpu_count() or 1
+    if use_multiprocessing and len(strategies) > 1 and cpu_count > 1:
+        max_workers = min(len(strategies), cpu_count)
+        completed: Dict[str, BacktestResult] = {}
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_strategy_worker,
+            initargs=(config, backtester.tick_history, backtester.price_history)
+        ) as executor:
+            futures = {}
+            for strategy in strategies:
+                print(f"\n運行 {strategy.name}...")
+                futures[executor.submit(_run_strategy_backtest, strategy)] = strategy.name
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    result = future.result()
+                    completed[name] = result
+                    print(f"  ✓ {name} 完成: IL={result.impermanent_loss_pct:.2f}%")
+                except Exception as e:
+                    print(f"  ✗ {name} 錯誤: {e}")
+                    import traceback
+                    traceback.print_exc()
+        # 保持策略原有順序（影響圖表與 CSV 輸出順序）
+        for strategy in strategies:
+            if strategy.name in completed:
+                results[strategy.name] = completed[strategy.name]
+    else:
+        for strategy in strategies:
+            name = strategy.name
+            print(f"\n運行 {name}...")
+            try:
+                result = backtester.run_backtest(strategy)
+                results[name] = result
+                print(f"  ✓ 完成: IL={result.impermanent_loss_pct:.2f}%")
+            except Exception as e:
+                print(f"  ✗ 錯誤: {e}")
+                import traceback
+                traceback.print_exc()
     
     # Load Omnis AI results
     print("\n載入 Omnis AI (ATR) 回測結果...")
-    omnis_value_history = load_value_history("output/value_history.csv")
-    if omnis_value_history:
-        # Convert to Decimal format
-        omnis_value_history_decimal = [(ts, Decimal(str(val))) for ts, val in omnis_value_history]
+    omnis_ts, omnis_values = load_value_history("output/value_history.csv")
+    if len(omnis_ts):
+        # 直接保留 float 數組，跳過 Decimal 往返轉換
         results["Omnis AI (ATR)"] = BacktestResult(
             strategy_name="Omnis AI (ATR)",
             initial_value=Decimal('10000'),
-            final_value=Decimal(str(omnis_value_history[-1][1])),
+            final_value=Decimal(str(float(omnis_values[-1]))),
             total_return_pct=-15.70,
             annualized_return_pct=-40.45,
             max_drawdown_pct=18.07,
@@ -219,7 +335,8 @@ def run_il_analysis(
             total_swap_cost=Decimal('0'),
             impermanent_loss_pct=-56.63,
             time_in_range_pct=100.0,
-            value_history=omnis_value_history_decimal
+            value_timestamps=omnis_ts,
+            value_history_f64=omnis_values
         )
         print(f"  ✓ 完成: IL={results['Omnis AI (ATR)'].impermanent_loss_pct:.2f}%")
     
@@ -228,17 +345,27 @@ def run_il_analysis(
     print("計算 IL 時間序列...")
     print("=" * 70)
     
-    price_history = [(ts, price) for ts, price in backtester.price_history]
+    # 價格歷史一次性轉為按時間排序的列式數組，供 IL 計算和圖表共用
+    price_ts = np.fromiter((ts for ts, _ in ph), dtype=np.int64, count=len(ph))
+    price_val = np.fromiter((p for _, p in ph), dtype=np.float64, count=len(ph))
+    order = np.argsort(price_ts, kind='stable')
+    price_ts = price_ts[order]
+    price_val = price_val[order]
     
     il_data: Dict[str, List[Tuple[int, float, float, float]]] = {}
     
+    amount0 = config.initial_amount0
+    amount1 = config.initial_amount1
     for name, result in results.items():
-        if result.value_history:
+        value_f64 = result.value_history_f64
+        if len(value_f64):
             il_series = calculate_il_time_series(
-                result.value_history,
-                price_history,
-                config.initial_amount0,
-                config.initial_amount1,
+                result.value_timestamps,
+                value_f64,
+                price_ts,
+                price_val,
+                amount0,
+                amount1,
                 first_price
             )
             il_data[name] = il_series
@@ -252,11 +379,13 @@ def run_il_analysis(
     print("生成 IL 分析圖表...")
     print("=" * 70)
     
-    generate_il_charts(il_data, price_history, output_dir, first_date, last_date)
+    # 過濾異常值後的數組只構建一次，圖表和 CSV 共用
+    clean = clean_il_arrays(il_data)
+    generate_il_charts(il_data, price_ts, price_val, output_dir, first_date, last_date, clean)
     
     # Save CSV
     print("\n保存 IL 數據到 CSV...")
-    save_il_csv(il_data, output_dir)
+    save_il_csv(il_data, output_dir, clean)
     
     print("\n" + "=" * 70)
     print(f"✅ IL 分析完成！輸出目錄: {output_dir}")
@@ -265,155 +394,118 @@ def run_il_analysis(
 
 def generate_il_charts(
     il_data: Dict[str, List[Tuple[int, float, float, float]]],
-    price_history: List[Tuple[int, float]],
+    price_ts: np.ndarray,
+    price_val: np.ndarray,
     output_dir: str,
     first_date: str,
-    last_date: str
+    last_date: str,
+    clean: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None
 ):
-    """生成 IL 分析圖表"""
+    """生成 IL 分析圖表
     
-    # Set style
-    plt.style.use('seaborn-v0_8-darkgrid')
+    clean: clean_il_arrays 的結果；未提供時在此計算
+    """
     
-    # Color palette
-    colors = {
-        'Omnis AI (ATR)': '#2E86AB',
-        'Charm Alpha Vault': '#A23B72',
-        'Steer Classic Rebalance': '#F18F01',
-        'Steer Elastic Expansion': '#C73E1D',
-    }
+    if clean is None:
+        clean = clean_il_arrays(il_data)
     
     # 1. IL 時間序列比較
-    fig, ax = plt.subplots(figsize=(14, 8))
+    # 四張圖共用同一個 Figure，每張圖之間 clf() 重置
+    fig = plt.figure(figsize=(14, 8))
+    ax = fig.add_subplot()
     
-    for name, il_series in il_data.items():
-        if not il_series:
-            continue
+    for name, (ts_np, il_values) in clean.items():
+        # datetime64 由 matplotlib 直接在 C 層轉換，無需逐點創建 datetime 對象
+        timestamps = ts_np.astype('datetime64[s]')
         
-        # 過濾異常值
-        filtered_series = [(ts, il) for ts, _, _, il in il_series if -100 <= il <= 100]
-        if not filtered_series:
-            continue
-        
-        timestamps = [datetime.fromtimestamp(ts) for ts, _ in filtered_series]
-        il_values = [il for _, il in filtered_series]
-        
-        color = colors.get(name, '#666666')
-        ax.plot(timestamps, il_values, label=name, linewidth=2, color=color, alpha=0.8)
+        ax.plot(timestamps, il_values, label=name, **STYLE.get(name, DEFAULT_STYLE))
     
     ax.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.3)
     ax.set_xlabel('Date', fontsize=12, fontweight='bold')
     ax.set_ylabel('Impermanent Loss (%)', fontsize=12, fontweight='bold')
     ax.set_title(f'Impermanent Loss Comparison ({first_date} to {last_date})', fontsize=14, fontweight='bold')
-    ax.legend(loc='lower left', fontsize=10, framealpha=0.9)
+    ax.legend(loc='lower left', **LEGEND_STYLE)
     ax.grid(True, alpha=0.3)
     
     # Format x-axis
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
     ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=2))
-    plt.xticks(rotation=45)
+    ax.tick_params(axis='x', labelrotation=45)
     
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/il_time_series.png", dpi=300, bbox_inches='tight')
+    fig.tight_layout()
+    fig.savefig(f"{output_dir}/il_time_series.png", **_SAVEFIG_KWARGS)
     print(f"  ✓ il_time_series.png")
-    plt.close()
     
     # 2. IL vs Price Change
-    fig, ax = plt.subplots(figsize=(14, 8))
+    fig.clf()
+    ax = fig.add_subplot()
     
     # Calculate price change percentage
-    first_price = price_history[0][1]
+    first_price = price_val[0]
     
-    for name, il_series in il_data.items():
-        if not il_series:
-            continue
+    # 每個策略用 searchsorted 批量查找最近價格
+    for name, (ts_np, il_values) in clean.items():
+        closest_prices = price_val[_nearest_price_indices(price_ts, ts_np)]
+        price_changes = ((closest_prices / first_price) - 1) * 100
         
-        # 過濾異常值
-        filtered_series = [(ts, il) for ts, _, _, il in il_series if -100 <= il <= 100]
-        if not filtered_series:
-            continue
-        
-        timestamps = [ts for ts, _ in filtered_series]
-        il_values = [il for _, il in filtered_series]
-        
-        # Get corresponding prices
-        price_changes = []
-        for ts, _ in filtered_series:
-            # Find closest price
-            closest_price = min(price_history, key=lambda x: abs(x[0] - ts))[1]
-            price_change = ((closest_price / first_price) - 1) * 100
-            price_changes.append(price_change)
-        
-        color = colors.get(name, '#666666')
-        ax.plot(price_changes, il_values, label=name, linewidth=2, color=color, alpha=0.8, marker='o', markersize=3)
+        ax.plot(price_changes, il_values, label=name, marker='o', markersize=3,
+                **STYLE.get(name, DEFAULT_STYLE))
     
     ax.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.3)
     ax.axvline(x=0, color='black', linestyle='--', linewidth=1, alpha=0.3)
     ax.set_xlabel('BTC Price Change (%)', fontsize=12, fontweight='bold')
     ax.set_ylabel('Impermanent Loss (%)', fontsize=12, fontweight='bold')
     ax.set_title('IL vs Price Change', fontsize=14, fontweight='bold')
-    ax.legend(loc='best', fontsize=10, framealpha=0.9)
+    ax.legend(loc='best', **LEGEND_STYLE)
     ax.grid(True, alpha=0.3)
     
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/il_vs_price_change.png", dpi=300, bbox_inches='tight')
+    fig.tight_layout()
+    fig.savefig(f"{output_dir}/il_vs_price_change.png", **_SAVEFIG_KWARGS)
     print(f"  ✓ il_vs_price_change.png")
-    plt.close()
     
     # 3. IL Distribution (Histogram)
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    axes = axes.flatten()
+    fig.clf()
+    fig.set_size_inches(14, 10)
+    axes = fig.subplots(2, 2).flatten()
     
-    for idx, (name, il_series) in enumerate(il_data.items()):
-        if idx >= len(axes) or not il_series:
-            continue
-        
-        # 過濾異常值
-        il_values = [il for _, _, _, il in il_series if -100 <= il <= 100]
-        
-        if not il_values:
+    for idx, name in enumerate(il_data):
+        if idx >= len(axes) or name not in clean:
             continue
         
+        il_values = clean[name][1]
         ax = axes[idx]
-        ax.hist(il_values, bins=30, color=colors.get(name, '#666666'), alpha=0.7, edgecolor='black')
+        ax.hist(il_values, bins=30, color=IL_COLORS.get(name, DEFAULT_COLOR), alpha=0.7, edgecolor='black',
+                rasterized=True)
         ax.axvline(x=0, color='red', linestyle='--', linewidth=2, alpha=0.5)
         ax.set_xlabel('Impermanent Loss (%)', fontsize=10)
         ax.set_ylabel('Frequency', fontsize=10)
-        ax.set_title(f'{name}\nMean: {np.mean(il_values):.2f}%', fontsize=11, fontweight='bold')
+        ax.set_title(f'{name}\nMean: {il_values.mean():.2f}%', fontsize=11, fontweight='bold')
         ax.grid(True, alpha=0.3)
     
     # Hide unused subplots
     for idx in range(len(il_data), len(axes)):
         axes[idx].set_visible(False)
     
-    plt.suptitle('IL Distribution by Strategy', fontsize=14, fontweight='bold', y=0.995)
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/il_distribution.png", dpi=300, bbox_inches='tight')
+    fig.suptitle('IL Distribution by Strategy', fontsize=14, fontweight='bold', y=0.995)
+    fig.tight_layout()
+    fig.savefig(f"{output_dir}/il_distribution.png", **_SAVEFIG_KWARGS)
     print(f"  ✓ il_distribution.png")
-    plt.close()
     
     # 4. IL Summary Bar Chart
-    fig, ax = plt.subplots(figsize=(12, 7))
+    fig.clf()
+    fig.set_size_inches(12, 7)
+    ax = fig.add_subplot()
     
     strategy_names = []
     final_il = []
     max_il = []
     mean_il = []
     
-    for name, il_series in il_data.items():
-        if not il_series:
-            continue
-        
-        # 過濾異常值（只保留 -100% 到 +100% 範圍內的數據）
-        il_values = [il for _, _, _, il in il_series if -100 <= il <= 100]
-        
-        if not il_values:
-            continue
-        
+    for name, (_, il_values) in clean.items():
         strategy_names.append(name)
         final_il.append(il_values[-1])
-        max_il.append(min(il_values))  # Most negative (worst)
-        mean_il.append(np.mean(il_values))
+        max_il.append(il_values.min())  # Most negative (worst)
+        mean_il.append(il_values.mean())
     
     x = np.arange(len(strategy_names))
     width = 0.25
@@ -427,7 +519,7 @@ def generate_il_charts(
     ax.set_title('IL Summary Comparison', fontsize=14, fontweight='bold')
     ax.set_xticks(x)
     ax.set_xticklabels(strategy_names, rotation=15, ha='right')
-    ax.legend(fontsize=10, framealpha=0.9)
+    ax.legend(**LEGEND_STYLE)
     ax.grid(True, alpha=0.3, axis='y')
     ax.axhline(y=0, color='black', linestyle='-', linewidth=1)
     
@@ -439,15 +531,22 @@ def generate_il_charts(
                    f'{height:.1f}%',
                    ha='center', va='bottom' if height > 0 else 'top', fontsize=8)
     
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/il_summary_bar.png", dpi=300, bbox_inches='tight')
+    fig.tight_layout()
+    fig.savefig(f"{output_dir}/il_summary_bar.png", **_SAVEFIG_KWARGS)
     print(f"  ✓ il_summary_bar.png")
-    plt.close()
+    plt.close(fig)
 
 
-def save_il_csv(il_data: Dict[str, List[Tuple[int, float, float, float]]], output_dir: str):
+def save_il_csv(
+    il_data: Dict[str, List[Tuple[int, float, float, float]]],
+    output_dir: str,
+    clean: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None
+):
     """保存 IL 數據到 CSV"""
     
+    if clean is None:
+        clean = clean_il_arrays(il_data)
+    
     # Save individual strategy IL time series
     for name, il_series in il_data.items():
         filename = f"{output_dir}/il_{name.replace(' ', '_').replace('(', '').replace(')', '').lower()}.csv"
@@ -456,9 +555,24 @@ def save_il_csv(il_data: Dict[str, List[Tuple[int, float, float, float]]], outpu
             writer = csv.writer(f)
             writer.writerow(['timestamp', 'datetime', 'lp_value_usdc', 'hodl_value_usdc', 'il_pct'])
             
-            for ts, lp_val, hodl_val, il_pct in il_series:
-                dt = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
-                writer.writerow([ts, dt, f"{lp_val:.2f}", f"{hodl_val:.2f}", f"{il_pct:.4f}"])
+            if il_series:
+                # 按列批量格式化後一次寫出，取代逐行 f-string + writerow
+                data = np.fromiter(il_series, dtype=IL_RECORD_DTYPE, count=len(il_series))
+                ts_np = data['ts']
+                columns = [
+                    ts_np.astype(str).tolist(),
+                    # 本地時間，與 value_history.csv / price_history.csv 一致
+                    list(iter_local_datetimes(ts_np.tolist())),
+                    np.char.mod('%.2f', data['lp']).tolist(),
+                    np.char.mod('%.2f', data['hodl']).tolist(),
+                    np.char.mod('%.4f', data['il']).tolist(),
+                ]
+                writer.writerows(zip(*columns))
+        
+        # 二進制副本供下游腳本快速載入（CSV 保留給人閱讀）
+        if il_series:
+            np.savez_compressed(_npz_sidecar_path(filename),
+                                ts=data['ts'], lp=data['lp'], hodl=data['hodl'], il=data['il'])
         
         print(f"  ✓ {os.path.basename(filename)}")
     
@@ -468,23 +582,14 @@ def save_il_csv(il_data: Dict[str, List[Tuple[int, float, float, float]]], outpu
         writer = csv.writer(f)
         writer.writerow(['strategy', 'final_il_pct', 'max_il_pct', 'mean_il_pct', 'min_il_pct', 'std_il_pct'])
         
-        for name, il_series in il_data.items():
-            if not il_series:
-                continue
-            
-            # 過濾異常值（只保留 -100% 到 +100% 範圍內的數據）
-            il_values = [il for _, _, _, il in il_series if -100 <= il <= 100]
-            
-            if not il_values:
-                continue
-            
+        for name, (_, il_values) in clean.items():
             writer.writerow([
                 name,
                 f"{il_values[-1]:.4f}",
-                f"{max(il_values):.4f}",
-                f"{np.mean(il_values):.4f}",
-                f"{min(il_values):.4f}",
-                f"{np.std(il_values):.4f}"
+                f"{il_values.max():.4f}",
+                f"{il_values.mean():.4f}",
+                f"{il_values.min():.4f}",
+                f"{il_values.std():.4f}"
             ])
     
     print(f"  ✓ il_summary.csv")
@@ -6,6 +6,22 @@ import math
 from typing import List, Tuple, Optional
 from collections import deque
 
+# _price_to_tick 的循環不變量：tick = (log(price) - log(100)) / log(1.0001)
+_INV_LOG_1_0001 = 1.0 / math.log(1.0001)
+_LOG_100 = math.log(100.0)
+
+
+def _true_range(high: float, low: float, prev_close: float) -> float:
+    """True Range = max(高低差, |高 - 前收|, |低 - 前收|)（純數值計算，不創建臨時 tuple）"""
+    tr = high - low  # 當日高低差
+    d = abs(high - prev_close)  # 當日高 - 前收
+    if d > tr:
+        tr = d
+    d = abs(low - prev_close)  # 當日低 - 前收
+    if d > tr:
+        tr = d
+    return tr
+
 
 class ATRStrategy:
     """基於 ATR 的 LP 區間策略"""
@@ -14,23 +30,26 @@ class ATRStrategy:
         self,
         atr_period: int = 14,
         atr_multiplier: float = 2.0,
-        rebalance_interval: int = 180  # Rebalance 檢查間隔（秒，默認 180 = 3分鐘）
+        rebalance_interval: int = 180,  # Rebalance 檢查間隔（秒，默認 180 = 3分鐘）
+        use_wilder: bool = False
     ):
         """
         Args:
             atr_period: ATR 計算週期（默認 14）
             atr_multiplier: ATR 倍數，用於計算價格區間（默認 2.0，即 ±2*ATR）
             rebalance_interval: Rebalance 檢查間隔（秒，默認 180 = 3分鐘）
+            use_wilder: 使用 Wilder 平滑（atr = (atr*(p-1)+tr)/p）代替簡單移動平均
         """
         self.atr_period = atr_period
         self.atr_multiplier = atr_multiplier
         self.rebalance_interval = rebalance_interval
+        self.use_wilder = use_wilder
         
-        # ATR 計算相關
-        self.price_history: deque = deque(maxlen=atr_period + 1)
-        self.high_history: deque = deque(maxlen=atr_period + 1)
-        self.low_history: deque = deque(maxlen=atr_period + 1)
+        # ATR 計算相關（True Range 只依賴前一筆收盤價，無需保留價格窗口）
+        self.prev_close: Optional[float] = None
         self.true_ranges: deque = deque(maxlen=atr_period)
+        self._tr_sum: float = 0.0  # 窗口內 True Range 的滾動和
+        self._tr_pushes: int = 0  # 距上次精確重算滾動和後加入的 True Range 數
         self.atr: float = 0.0
         
         # Rebalance 追蹤
@@ -38,6 +57,8 @@ class ATRStrategy:
         self.current_range_center: Optional[float] = None
         self.current_range_lower: Optional[float] = None
         self.current_range_upper: Optional[float] = None
+        # 安全區邊距（範圍寬度的 20%），隨範圍一起更新；None 表示無有效範圍
+        self._rebalance_margin: Optional[float] = None
         
     def update_price(self, price: float, high: Optional[float] = None, low: Optional[float] = None, timestamp: int = 0):
         """更新價格數據並計算 ATR"""
@@ -46,23 +67,52 @@ class ATRStrategy:
         if low is None:
             low = price
         
-        self.price_history.append(price)
-        self.high_history.append(high)
-        self.low_history.append(low)
-        
         # 計算 True Range
-        if len(self.price_history) >= 2:
-            prev_close = self.price_history[-2]
-            tr = max(
-                high - low,  # 當日高低差
-                abs(high - prev_close),  # 當日高 - 前收
-                abs(low - prev_close)  # 當日低 - 前收
-            )
-            self.true_ranges.append(tr)
+        prev_close = self.prev_close
+        self.prev_close = price
+        if prev_close is None:
+            return
+        self._push_true_range(_true_range(high, low, prev_close))
+    
+    def update_price_scalar(self, price: float, timestamp: int = 0):
+        """update_price 的快速路徑：只有單一成交價（high == low == close == price）
+        
+        此時 True Range 退化為 |price - prev_close|，結果與 update_price(price, price, price, timestamp) 相同。
+        """
+        prev_close = self.prev_close
+        self.prev_close = price
+        if prev_close is None:
+            return
+        self._push_true_range(abs(price - prev_close))
+    
+    def _push_true_range(self, tr: float):
+        """加入一個 True Range 並更新 ATR（update_price / update_price_scalar 共用）"""
+        period = self.atr_period
+        if self.use_wilder and self.atr > 0:
+            # Wilder 平滑：以首個 SMA 為種子，之後 O(1) 遞推
+            self.atr = (self.atr * (period - 1) + tr) / period
+            return
+        
+        # 滾動和：加入新值、減去被擠出窗口的舊值，O(1) 代替每次 sum()
+        true_ranges = self.true_ranges
+        if len(true_ranges) == period:
+            self._tr_sum -= true_ranges[0]
+        true_ranges.append(tr)
+        self._tr_sum += tr
+        
+        # 增減會累積浮點誤差（窗口全為 0 時可能留下 -1e-12 之類的殘差），
+        # 窗口每輪換一遍就用 fsum 精確重算一次，攤銷後仍為 O(1)
+        self._tr_pushes += 1
+        if self._tr_pushes >= period:
+            self._tr_pushes = 0
+            self._tr_sum = math.fsum(true_ranges)
+        elif self._tr_sum < 0.0:
+            # True Range 非負，負的和只可能是殘差
+            self._tr_sum = 0.0
         
         # 計算 ATR（簡單移動平均）
-        if len(self.true_ranges) >= self.atr_period:
-            self.atr = sum(self.true_ranges) / len(self.true_ranges)
+        if len(true_ranges) >= period:
+            self.atr = self._tr_sum / len(true_ranges)
     
     def calculate_range(self, current_price: float, tick_spacing: int = 60) -> Tuple[int, int, float, float]:
         """根據 ATR 計算 LP 價格區間
@@ -99,6 +149,8 @@ class ATRStrategy:
         self.current_range_center = current_price
         self.current_range_lower = price_lower
         self.current_range_upper = price_upper
+        range_width = price_upper - price_lower
+        self._rebalance_margin = range_width * 0.2 if range_width > 0 else None
         
         return (tick_lower, tick_upper, price_lower, price_upper)
     
@@ -108,7 +160,7 @@ class ATRStrategy:
         # 對於 WBTC/USDC，需要考慮小數位數
         # 簡化：tick = log(price / 10^2) / log(1.0001)
         try:
-            tick = int(math.log(price / (10 ** 2)) / math.log(1.0001))
+            tick = int((math.log(price) - _LOG_100) * _INV_LOG_1_0001)
             # 對齊到 tick_spacing
             tick = (tick // tick_spacing) * tick_spacing
             return tick
@@ -137,18 +189,14 @@ class ATRStrategy:
         
         # 檢查價格是否偏離範圍中心足夠多
         # 只有當價格接近或超出範圍邊界時才 rebalance
-        if self.current_range_lower is not None and self.current_range_upper is not None:
-            range_width = self.current_range_upper - self.current_range_lower
-            if range_width > 0:
-                # 計算價格距離最近邊界的距離
-                dist_to_lower = current_price - self.current_range_lower
-                dist_to_upper = self.current_range_upper - current_price
-                min_dist = min(dist_to_lower, dist_to_upper)
-                
-                # 如果價格距離邊界小於範圍寬度的 20%，才 rebalance
-                # 即價格接近邊界或已經超出範圍
-                if min_dist > range_width * 0.2:
-                    return False  # 價格在安全區域內，不需要 rebalance
+        # 邊距在 calculate_range 時預先算好，這裡只需兩次比較
+        margin = self._rebalance_margin
+        if margin is not None:
+            # 如果價格距離兩側邊界都超過範圍寬度的 20%，價格在安全區域內，不需要 rebalance
+            # 否則價格接近邊界或已經超出範圍
+            if (current_price - self.current_range_lower > margin
+                    and self.current_range_upper - current_price > margin):
+                return False
         
         return True
     
@@ -8,30 +8,39 @@
 4. 統一 sqrt_price 處理
 """
 import math
+from array import array
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 try:
     from .amm_simulator import AMMSimulator, LiquidityPosition
-    from .event_processor import EventProcessor
+    from .event_processor import EventProcessor, EventBatch, SWAP, MINT, BURN
     from .performance_analyzer import PerformanceAnalyzer, PerformanceMetrics
     from .atr_strategy import ATRStrategy
     from .uniswap_v3_math import (
-        tick_to_sqrt_price, sqrt_price_to_price,
+        tick_to_sqrt_price, sqrt_price_to_price, get_sqrt_ratio_at_tick,
         get_amounts_from_liquidity, get_liquidity_from_amounts,
-        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS
+        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS, MIN_TICK, MAX_TICK
     )
 except ImportError:
     from amm_simulator import AMMSimulator, LiquidityPosition
-    from event_processor import EventProcessor
+    from event_processor import EventProcessor, EventBatch, SWAP, MINT, BURN
     from performance_analyzer import PerformanceAnalyzer, PerformanceMetrics
     from atr_strategy import ATRStrategy
     from uniswap_v3_math import (
-        tick_to_sqrt_price, sqrt_price_to_price,
+        tick_to_sqrt_price, sqrt_price_to_price, get_sqrt_ratio_at_tick,
         get_amounts_from_liquidity, get_liquidity_from_amounts,
-        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS
+        PRICE_SCALE, TOKEN0_DECIMALS, TOKEN1_DECIMALS, MIN_TICK, MAX_TICK
     )
 
+_LOG_1_0001 = math.log(1.0001)
+_INV_Q96 = 1.0 / float(1 << 96)
+# token 最小單位換算
+_SCALE0 = 10 ** TOKEN0_DECIMALS
+_SCALE1 = 10 ** TOKEN1_DECIMALS
+_INV_SCALE0 = 1.0 / _SCALE0
+_INV_SCALE1 = 1.0 / _SCALE1
+
 
 class BacktestEngine:
     """回測引擎"""
@@ -40,17 +49,22 @@ class BacktestEngine:
         self,
         data_file: str,
         initial_capital: float = 10000.0,
-        fee_tier: int = 3000
+        fee_tier: int = 3000,
+        use_mmap: bool = False
     ):
         self.data_file = data_file
         self.initial_capital = initial_capital
-        self.event_processor = EventProcessor(data_file)
+        self.event_processor = EventProcessor(data_file, use_mmap=use_mmap)
         self.amm = AMMSimulator(fee_tier=fee_tier)
         self.analyzer = PerformanceAnalyzer()
         
         # 回測狀態
         self.positions: List[LiquidityPosition] = []
-        self.value_history: List[Tuple[int, float]] = []
+        # 估值用的位置不變量，positions 變化時置為 None（見 _build_mark_cache）
+        self._mark_cache: Optional[List[tuple]] = None
+        # 價值歷史以兩個緊湊列存儲，value_history 屬性提供 [(timestamp, value), ...] 視圖
+        self.value_timestamps: array = array('q')
+        self.value_values: array = array('d')
         self.current_value: float = initial_capital
         self.total_fees_earned: float = 0.0
         
@@ -63,10 +77,38 @@ class BacktestEngine:
         self.initial_position_created: bool = False
         self.atr_strategy: Optional[ATRStrategy] = None
         self.rebalance_count: int = 0
-        self.rebalance_history: List[Tuple[int, float, float, float]] = []
         self.use_atr_strategy: bool = False
-        self.atr_range_history: List[Tuple[int, float, float, float, float]] = []
+        # rebalance 與 ATR 範圍歷史同樣按列存儲：(timestamp, price, price_lower, price_upper)
+        # 與 (timestamp, price, atr, price_lower, price_upper)，通過同名屬性提供 tuple 列表視圖
+        self._rebalance_columns: Tuple[array, ...] = (array('q'), array('d'), array('d'), array('d'))
+        self._atr_range_columns: Tuple[array, ...] = (
+            array('q'), array('d'), array('d'), array('d'), array('d')
+        )
         
+    @property
+    def value_history(self) -> List[Tuple[int, float]]:
+        """價值歷史 [(timestamp, value), ...]（向後兼容視圖，每次調用都會重新構建）"""
+        return list(zip(self.value_timestamps, self.value_values))
+    
+    @property
+    def rebalance_history(self) -> List[Tuple[int, float, float, float]]:
+        """rebalance 歷史 [(timestamp, price, price_lower, price_upper), ...]（每次調用都會重新構建）"""
+        return list(zip(*self._rebalance_columns))
+    
+    @property
+    def atr_range_history(self) -> List[Tuple[int, float, float, float, float]]:
+        """ATR 範圍歷史 [(timestamp, price, atr, price_lower, price_upper), ...]（每次調用都會重新構建）"""
+        return list(zip(*self._atr_range_columns))
+    
+    def _record_atr_range(self, timestamp: int, price: float, atr: float, price_lower: float, price_upper: float):
+        """追加一條 ATR 範圍記錄"""
+        ts_col, price_col, atr_col, lower_col, upper_col = self._atr_range_columns
+        ts_col.append(timestamp)
+        price_col.append(price)
+        atr_col.append(atr)
+        lower_col.append(price_lower)
+        upper_col.append(price_upper)
+    
     def run_backtest(
         self,
         start_block: Optional[int] = None,
@@ -103,40 +145,32 @@ class BacktestEngine:
                 rebalance_interval=rebalance_interval
             )
         
-        # 獲取事件
-        events = list(self.event_processor.get_events_in_range(
+        # 獲取事件（已排序的列式批次，主循環按行索引訪問各列）
+        batch = self.event_processor.get_event_batch(
             start_block=start_block,
             end_block=end_block,
             start_timestamp=start_timestamp,
             end_timestamp=end_timestamp
-        ))
+        )
+        num_events = len(batch)
         
-        if not events:
+        if not num_events:
             if verbose:
                 print("警告：沒有找到符合條件的事件")
             return self.analyzer.metrics
         
-        events.sort(key=lambda x: (
-            x.get('blockTimestamp', 0),
-            x.get('blockNumber', 0),
-            x.get('logIndex', 0)
-        ))
-        
         if verbose:
-            print(f"處理 {len(events)} 個事件...")
-        
-        first_event = events[0]
-        start_ts = first_event.get('blockTimestamp', 0)
-        end_ts = events[-1].get('blockTimestamp', start_ts)
+            print(f"處理 {num_events} 個事件...")
         
-        num_swaps = 0
-        num_mints = 0
-        num_burns = 0
+        event_types = batch.event_types
+        timestamps = batch.timestamps
+        start_ts = timestamps[0]
+        end_ts = timestamps[-1] or start_ts
         
         # 找第一個 Swap 來初始化
-        for event in events:
-            if event.get('eventType') == 'Swap':
-                self._process_swap(event)
+        for i in range(num_events):
+            if event_types[i] == SWAP:
+                self._process_swap_at(batch, i)
                 break
         
         # 創建初始位置
@@ -146,12 +180,12 @@ class BacktestEngine:
             
             if current_price > 0:
                 if self.use_atr_strategy and self.atr_strategy:
-                    self.atr_strategy.update_price(current_price, current_price, current_price, start_ts)
+                    self.atr_strategy.update_price_scalar(current_price, start_ts)
                     tick_spacing = 60
                     
                     # 使用較寬的初始範圍（±5%）
                     initial_range_pct = 0.05
-                    tick_range = int(math.log(1 + initial_range_pct) / math.log(1.0001))
+                    tick_range = int(math.log(1 + initial_range_pct) / _LOG_1_0001)
                     tick_range = max(tick_range, tick_spacing * 15)  # 至少 15 個 tick spacing
                     tick_range = (tick_range // tick_spacing) * tick_spacing
                     
@@ -161,7 +195,7 @@ class BacktestEngine:
                     price_lower = self._tick_to_display_price(tick_lower)
                     price_upper = self._tick_to_display_price(tick_upper)
                     
-                    self.atr_range_history.append((start_ts, current_price, 0.0, price_lower, price_upper))
+                    self._record_atr_range(start_ts, current_price, 0.0, price_lower, price_upper)
                 
                 self._create_initial_position(
                     start_ts,
@@ -174,54 +208,17 @@ class BacktestEngine:
                 if self.use_atr_strategy and self.atr_strategy:
                     self.atr_strategy.record_rebalance(start_ts)
         
-        # 處理事件
-        for i, event in enumerate(events):
-            event_type = event.get('eventType')
-            timestamp = event.get('blockTimestamp', 0)
-            
-            if event_type == 'Swap':
-                num_swaps += 1
-                self._process_swap(event)
-                
-                if self.use_atr_strategy and self.atr_strategy and self.initial_position_created:
-                    current_price = self.amm.get_current_price()
-                    if current_price > 0:
-                        self.atr_strategy.update_price(current_price, current_price, current_price, timestamp)
-                        
-                        # 記錄 ATR 範圍
-                        if i % 100 == 0:
-                            atr_value = self.atr_strategy.get_atr()
-                            tick_spacing = 60
-                            if atr_value > 0:
-                                _, _, price_lower, price_upper = self.atr_strategy.calculate_range(
-                                    current_price, tick_spacing
-                                )
-                            else:
-                                price_lower = current_price * 0.95
-                                price_upper = current_price * 1.05
-                            self.atr_range_history.append((timestamp, current_price, atr_value, price_lower, price_upper))
-                        
-                        # 檢查 rebalance
-                        if self.atr_strategy.should_rebalance(current_price, timestamp):
-                            self._rebalance_position(timestamp, verbose)
-                            
-            elif event_type == 'Mint':
-                num_mints += 1
-            elif event_type == 'Burn':
-                num_burns += 1
-            
-            # 定期記錄價值
-            if i % 100 == 0:
-                current_price = self.amm.get_current_price()
-                if current_price > 0:
-                    value = self._calculate_portfolio_value(current_price)
-                    self.value_history.append((timestamp, value))
-                    self.current_value = value
+        # 處理事件：按策略模式選擇專用循環，熱循環內不再反覆判斷模式標誌
+        if self.use_atr_strategy and self.atr_strategy and self.initial_position_created:
+            num_swaps, num_mints, num_burns = self._run_loop_atr(batch, verbose)
+        else:
+            num_swaps, num_mints, num_burns = self._run_loop_fixed(batch)
         
         # 最終計算
         final_price = self.amm.get_current_price()
         final_value = self._calculate_portfolio_value(final_price)
-        self.value_history.append((end_ts, final_value))
+        self.value_timestamps.append(end_ts)
+        self.value_values.append(final_value)
         
         if verbose:
             print(f"回測完成！")
@@ -253,13 +250,145 @@ class BacktestEngine:
         
         return metrics
     
+    def _run_loop_fixed(self, batch: EventBatch) -> Tuple[int, int, int]:
+        """固定區間模式（或 ATR 策略未能建倉）的主循環，返回 (Swap 數, Mint 數, Burn 數)
+        
+        固定區間下每個事件只需更新池子狀態，組合價值每 100 行採樣一次。
+        兩個採樣點之間的 Swap 一次性交給 amm.process_swaps 批量處理，
+        結果與逐行調用 _process_swap_at 相同；採樣點的估值在循環結束後批量計算。
+        """
+        event_types = batch.event_types
+        timestamps = batch.timestamps
+        sqrt_prices_x96 = batch.sqrt_prices_x96
+        ticks = batch.ticks
+        num_events = len(batch)
+        
+        amm = self.amm
+        marks = self._get_marks()
+        settled_fees_owed = self._settled_fees_owed
+        
+        # 循環內只記錄採樣點的池子狀態與各位置按當前 tick 結算後的應計手續費，
+        # 組合價值在循環結束後統一計算
+        samples = []
+        start = 0
+        for record_at in range(0, num_events + 99, 100):
+            stop = min(record_at + 1, num_events)
+            rows = [
+                r for r in range(start, stop)
+                if event_types[r] == SWAP and sqrt_prices_x96[r] and ticks[r] is not None
+            ]
+            if rows:
+                self._process_swap_rows(batch, rows)
+            start = stop
+            
+            if record_at < num_events:
+                current_price = amm.get_current_price()
+                if current_price > 0:
+                    samples.append((
+                        timestamps[record_at], current_price, amm.get_sqrt_price(), amm.pool_state.tick,
+                        settled_fees_owed(marks)
+                    ))
+        
+        # 定期記錄價值（固定區間下位置不變，估值只依賴採樣時的池子狀態）
+        mark_to_market = self._mark_to_market
+        for timestamp, current_price, sqrt_price, tick, fees_owed in samples:
+            self.value_timestamps.append(timestamp)
+            self.value_values.append(mark_to_market(marks, current_price, sqrt_price, tick, fees_owed))
+        if samples:
+            self.current_value = self.value_values[-1]
+        
+        return event_types.count(SWAP), event_types.count(MINT), event_types.count(BURN)
+    
+    def _run_loop_atr(self, batch: EventBatch, verbose: bool) -> Tuple[int, int, int]:
+        """ATR 策略模式的主循環，返回 (Swap 數, Mint 數, Burn 數)
+        
+        每個 Swap 後更新 ATR、每 100 行記錄一次 ATR 範圍，並檢查是否需要 rebalance。
+        """
+        event_types = batch.event_types
+        timestamps = batch.timestamps
+        atr_strategy = self.atr_strategy
+        get_current_price = self.amm.get_current_price
+        process_swap_at = self._process_swap_at
+        record_atr_range = self._record_atr_range
+        tick_spacing = 60
+        
+        num_swaps = 0
+        num_mints = 0
+        num_burns = 0
+        
+        for i in range(len(batch)):
+            event_type = event_types[i]
+            timestamp = timestamps[i]
+            # 本行處理後的池子價格（rebalance 不改變池子價格），同一行內只讀取一次
+            current_price = None
+            
+            if event_type == SWAP:
+                num_swaps += 1
+                process_swap_at(batch, i)
+                
+                current_price = get_current_price()
+                if current_price > 0:
+                    atr_strategy.update_price_scalar(current_price, timestamp)
+                    
+                    # 記錄 ATR 範圍
+                    if i % 100 == 0:
+                        atr_value = atr_strategy.get_atr()
+                        if atr_value > 0:
+                            _, _, price_lower, price_upper = atr_strategy.calculate_range(
+                                current_price, tick_spacing
+                            )
+                        else:
+                            price_lower = current_price * 0.95
+                            price_upper = current_price * 1.05
+                        record_atr_range(timestamp, current_price, atr_value, price_lower, price_upper)
+                    
+                    # 檢查 rebalance
+                    if atr_strategy.should_rebalance(current_price, timestamp):
+                        self._rebalance_position(timestamp, verbose, current_price)
+                
+            elif event_type == MINT:
+                num_mints += 1
+            elif event_type == BURN:
+                num_burns += 1
+            
+            # 定期記錄價值
+            if i % 100 == 0:
+                if current_price is None:
+                    current_price = get_current_price()
+                if current_price > 0:
+                    value = self._calculate_portfolio_value(current_price)
+                    self.value_timestamps.append(timestamp)
+                    self.value_values.append(value)
+                    self.current_value = value
+        
+        return num_swaps, num_mints, num_burns
+    
+    def _process_swap_rows(self, batch: EventBatch, rows: List[int]):
+        """批量處理列式批次中指定行的 Swap 事件（行須已通過有效性檢查）"""
+        amounts0 = batch.amounts0
+        amounts1 = batch.amounts1
+        sqrt_prices_x96 = batch.sqrt_prices_x96
+        ticks = batch.ticks
+        liquidities = batch.liquidities
+        timestamps = batch.timestamps
+        self.amm.process_swaps(
+            amounts0=[amounts0[r] for r in rows],
+            amounts1=[amounts1[r] for r in rows],
+            sqrt_prices_x96=[sqrt_prices_x96[r] for r in rows],
+            ticks=[ticks[r] for r in rows],
+            liquidities=[liquidities[r] for r in rows],
+            timestamps=[timestamps[r] for r in rows]
+        )
+    
     def _tick_to_display_price(self, tick: int) -> float:
-        """將 tick 轉換為顯示價格"""
-        try:
-            raw_price = math.exp(tick * math.log(1.0001))
-            return raw_price * PRICE_SCALE
-        except (OverflowError, ValueError):
-            return 0.0
+        """將 tick 轉換為顯示價格，超出 Uniswap V3 tick 範圍時返回 0
+        
+        經由 get_sqrt_ratio_at_tick 的整數 sqrtPriceX96 換算，與鏈上價格一致。
+        """
+        if MIN_TICK <= tick <= MAX_TICK:
+            sqrt_price = get_sqrt_ratio_at_tick(tick) * _INV_Q96
+            return sqrt_price * sqrt_price * PRICE_SCALE
+        return 0.0
     
     def _process_swap(self, event: Dict):
         """處理 Swap 事件"""
@@ -278,6 +407,21 @@ class BacktestEngine:
                 timestamp=timestamp
             )
     
+    def _process_swap_at(self, batch: EventBatch, i: int):
+        """處理列式批次中第 i 行的 Swap 事件（與 _process_swap 等價）"""
+        sqrt_price_x96 = batch.sqrt_prices_x96[i]
+        tick = batch.ticks[i]
+        
+        if sqrt_price_x96 and tick is not None:
+            self.amm.process_swap(
+                amount0=batch.amounts0[i],
+                amount1=batch.amounts1[i],
+                sqrt_price_x96=sqrt_price_x96,
+                tick=tick,
+                liquidity=batch.liquidities[i],
+                timestamp=batch.timestamps[i]
+            )
+    
     def _calculate_portfolio_value(self, current_price: float) -> float:
         """計算投資組合價值
         
@@ -287,25 +431,107 @@ class BacktestEngine:
         if not self.amm.pool_state:
             return self.initial_capital
         
+        marks = self._get_marks()
+        fees_owed = self._settled_fees_owed(marks)
+        return self._mark_to_market(
+            marks, current_price, self.amm.get_sqrt_price(), self.amm.pool_state.tick, fees_owed
+        )
+    
+    def _settled_fees_owed(self, marks: List[tuple]) -> List[Tuple[int, int]]:
+        """按當前 tick 結算各位置的手續費後，返回 (tokens_owed0, tokens_owed1) 列表
+        
+        swap 按成交前的 tick 結算手續費，被該筆 swap 帶回區間內的位置要到估值時
+        才按當前 tick 結算（與 calculate_position_value 相同）。
+        """
+        collect = self.amm._collect_fees_for_position
+        fees_owed = []
+        for mark in marks:
+            position = mark[0]
+            collect(position)
+            fees_owed.append((position.tokens_owed0, position.tokens_owed1))
+        return fees_owed
+    
+    def _get_marks(self) -> List[tuple]:
+        """返回當前位置的估值不變量，必要時重建（見 _build_mark_cache）"""
+        marks = self._mark_cache
+        if marks is None:
+            marks = self._mark_cache = self._build_mark_cache()
+        return marks
+    
+    @staticmethod
+    def _mark_to_market(
+        marks: List[tuple],
+        current_price: float,
+        sqrt_price_current: float,
+        current_tick: int,
+        fees_owed: List[Tuple[int, int]]
+    ) -> float:
+        """按給定的池子狀態計算組合價值
+        
+        fees_owed 與 marks 一一對應，為各位置的 (tokens_owed0, tokens_owed1)。
+        與對每個位置調用 calculate_position_value 等價，
+        只有價格在區間內時才需要按當前價格重新計算。
+        """
         total_value = 0.0
         uncollected_fees = 0.0
         
-        for position in self.positions:
-            if position.liquidity > 0:
-                _, value, fees = self.amm.calculate_position_value(position, current_price)
-                total_value += value
-                uncollected_fees += fees
+        for (_, L, sqrt_lower, inv_sqrt_upper, tick_lower, tick_upper, amount0_below, amount1_above), \
+                (owed0, owed1) in zip(marks, fees_owed):
+            if L <= 0.0 or sqrt_price_current <= 0:
+                amount0 = amount1 = 0
+            elif current_tick < tick_lower:
+                amount0 = amount0_below
+                amount1 = 0
+            elif current_tick >= tick_upper:
+                amount0 = 0
+                amount1 = amount1_above
+            else:
+                amount0 = int(max(0.0, L * (1.0 / sqrt_price_current - inv_sqrt_upper)))
+                amount1 = int(max(0.0, L * (sqrt_price_current - sqrt_lower)))
+            
+            total_value += amount0 * _INV_SCALE0 * current_price + amount1 * _INV_SCALE1
+            uncollected_fees += owed0 * _INV_SCALE0 * current_price + owed1 * _INV_SCALE1
         
         # 總價值 = 位置價值 + 未提取的手續費
         # 注意：已提取的手續費會在 rebalance 時重新投入，所以不需要單獨加
         return total_value + uncollected_fees
     
-    def _rebalance_position(self, timestamp: int, verbose: bool = True):
-        """執行 rebalance"""
+    def _build_mark_cache(self) -> List[tuple]:
+        """預計算每個有效位置估值時與價格無關的部分
+        
+        每項為 (position, L, √P_lower, 1/√P_upper, tick_lower, tick_upper,
+        價格在區間下方時的 amount0, 價格在區間上方時的 amount1)，數量與
+        get_amounts_from_liquidity 一樣截斷為整數合約單位。
+        區間無效（√P 非正或下界不小於上界）時 L 記為 0，位置價值為 0 但仍計入手續費。
+        """
+        marks = []
+        for position in self.positions:
+            if position.liquidity <= 0:
+                continue
+            sqrt_lower = position.sqrt_price_lower_cache or tick_to_sqrt_price(position.tick_lower)
+            sqrt_upper = position.sqrt_price_upper_cache or tick_to_sqrt_price(position.tick_upper)
+            if sqrt_lower <= 0 or sqrt_upper <= 0 or sqrt_lower >= sqrt_upper:
+                marks.append((position, 0.0, 0.0, 0.0, position.tick_lower, position.tick_upper, 0, 0))
+                continue
+            L = float(position.liquidity)
+            marks.append((
+                position, L, sqrt_lower, 1.0 / sqrt_upper,
+                position.tick_lower, position.tick_upper,
+                int(max(0.0, L * (1.0 / sqrt_lower - 1.0 / sqrt_upper))),
+                int(max(0.0, L * (sqrt_upper - sqrt_lower)))
+            ))
+        return marks
+    
+    def _rebalance_position(self, timestamp: int, verbose: bool = True, current_price: Optional[float] = None):
+        """執行 rebalance
+        
+        current_price: 調用方已讀取的當前池子價格；為 None 時重新讀取
+        """
         if not self.amm.pool_state or not self.positions:
             return
         
-        current_price = self.amm.get_current_price()
+        if current_price is None:
+            current_price = self.amm.get_current_price()
         if current_price <= 0 or not self.atr_strategy:
             return
         
@@ -316,7 +542,7 @@ class BacktestEngine:
         if atr_value <= 0:
             # 使用 ±3% 的範圍
             range_pct = 0.03
-            tick_range = int(math.log(1 + range_pct) / math.log(1.0001))
+            tick_range = int(math.log(1 + range_pct) / _LOG_1_0001)
             tick_range = max(tick_range, tick_spacing * 5)
             tick_range = (tick_range // tick_spacing) * tick_spacing
             
@@ -347,11 +573,11 @@ class BacktestEngine:
             print(f"  ATR: {atr_value:.2f} USDC")
             print(f"  新區間: {price_lower:.2f} ~ {price_upper:.2f} USDC (tick: {tick_lower} ~ {tick_upper})")
         
-        # 移除舊位置
-        total_wbtc = 0.0
-        total_usdc = 0.0
-        total_fees_wbtc = 0.0
-        total_fees_usdc = 0.0
+        # 移除舊位置：先以合約整數單位累加，最後統一換算
+        total_amount0 = 0
+        total_amount1 = 0
+        total_fee0 = 0
+        total_fee1 = 0
         
         for position in list(self.positions):
             if position.liquidity > 0:
@@ -361,13 +587,18 @@ class BacktestEngine:
                     tick_upper=position.tick_upper,
                     liquidity=position.liquidity
                 )
-                
-                total_wbtc += float(amount0) / (10 ** TOKEN0_DECIMALS)
-                total_usdc += float(amount1) / (10 ** TOKEN1_DECIMALS)
-                total_fees_wbtc += float(fee0) / (10 ** TOKEN0_DECIMALS)
-                total_fees_usdc += float(fee1) / (10 ** TOKEN1_DECIMALS)
+                total_amount0 += amount0
+                total_amount1 += amount1
+                total_fee0 += fee0
+                total_fee1 += fee1
         
         self.positions.clear()
+        self._mark_cache = None
+        
+        total_wbtc = total_amount0 * _INV_SCALE0
+        total_usdc = total_amount1 * _INV_SCALE1
+        total_fees_wbtc = total_fee0 * _INV_SCALE0
+        total_fees_usdc = total_fee1 * _INV_SCALE1
         
         # 計算可用資金（流動性 + 手續費）
         token_value = total_wbtc * current_price + total_usdc
@@ -396,12 +627,17 @@ class BacktestEngine:
                 tick_lower=tick_lower,
                 tick_upper=tick_upper,
                 capital=available_capital,
-                verbose=False
+                verbose=False,
+                current_price=current_price
             )
         
         self.atr_strategy.record_rebalance(timestamp)
         self.rebalance_count += 1
-        self.rebalance_history.append((timestamp, current_price, price_lower, price_upper))
+        ts_col, price_col, lower_col, upper_col = self._rebalance_columns
+        ts_col.append(timestamp)
+        price_col.append(current_price)
+        lower_col.append(price_lower)
+        upper_col.append(price_upper)
     
     def _create_lp_position(
         self,
@@ -409,13 +645,15 @@ class BacktestEngine:
         tick_lower: int,
         tick_upper: int,
         capital: float,
-        verbose: bool = True
+        verbose: bool = True,
+        current_price: Optional[float] = None
     ):
-        """創建 LP 位置"""
+        """創建 LP 位置（current_price 為 None 時讀取當前池子價格）"""
         if not self.amm.pool_state:
             return
         
-        current_price = self.amm.get_current_price()
+        if current_price is None:
+            current_price = self.amm.get_current_price()
         current_tick = self.amm.pool_state.tick
         
         if current_price <= 0:
@@ -429,28 +667,17 @@ class BacktestEngine:
         price_lower = self._tick_to_display_price(tick_lower)
         price_upper = self._tick_to_display_price(tick_upper)
         
-        # 根據價格位置分配資金
-        if current_price < price_lower:
-            # 全部 WBTC
-            wbtc_amount = capital / current_price
-            usdc_amount = 0.0
-        elif current_price > price_upper:
-            # 全部 USDC
-            wbtc_amount = 0.0
-            usdc_amount = capital
-        else:
-            # 在範圍內，按比例分配
-            # 計算最優比例
-            price_ratio = (current_price - price_lower) / (price_upper - price_lower)
-            usdc_ratio = price_ratio
-            wbtc_ratio = 1 - price_ratio
-            
-            usdc_amount = capital * usdc_ratio
-            wbtc_amount = (capital * wbtc_ratio) / current_price
+        # 根據價格位置分配資金：USDC 比例為價格在區間內的相對位置，夾在 [0, 1]
+        # 價格低於區間時比例為 0（全部 WBTC），高於區間時為 1（全部 USDC）
+        usdc_ratio = min(max((current_price - price_lower) / (price_upper - price_lower), 0.0), 1.0)
+        wbtc_ratio = 1 - usdc_ratio
+        
+        usdc_amount = capital * usdc_ratio
+        wbtc_amount = (capital * wbtc_ratio) / current_price
         
         # 轉換為合約單位
-        amount0 = int(wbtc_amount * (10 ** TOKEN0_DECIMALS))
-        amount1 = int(usdc_amount * (10 ** TOKEN1_DECIMALS))
+        amount0 = int(wbtc_amount * _SCALE0)
+        amount1 = int(usdc_amount * _SCALE1)
         
         # 計算流動性
         liquidity = get_liquidity_from_amounts(
@@ -475,6 +702,7 @@ class BacktestEngine:
                 timestamp=timestamp
             )
             self.positions.append(position)
+            self._mark_cache = None
     
     def _create_initial_position(
         self,
@@ -497,7 +725,7 @@ class BacktestEngine:
         
         # 計算 tick 範圍
         if tick_lower is None or tick_upper is None:
-            tick_range = int(math.log(1 + price_range_pct) / math.log(1.0001))
+            tick_range = int(math.log(1 + price_range_pct) / _LOG_1_0001)
             tick_range = max(tick_range, tick_spacing * 10)
             tick_range = (tick_range // tick_spacing) * tick_spacing
             
@@ -534,8 +762,8 @@ class BacktestEngine:
             usdc_amount = self.initial_capital * usdc_ratio
             wbtc_amount = (self.initial_capital * wbtc_ratio) / current_price
         
-        amount0 = int(wbtc_amount * (10 ** TOKEN0_DECIMALS))
-        amount1 = int(usdc_amount * (10 ** TOKEN1_DECIMALS))
+        amount0 = int(wbtc_amount * _SCALE0)
+        amount1 = int(usdc_amount * _SCALE1)
         
         # 計算流動性
         liquidity = get_liquidity_from_amounts(
@@ -560,6 +788,7 @@ class BacktestEngine:
                 timestamp=timestamp
             )
             self.positions.append(position)
+            self._mark_cache = None
             self.initial_position_created = True
             
             # 記錄初始信息（用於 IL 計算）
@@ -581,7 +810,11 @@ class BacktestEngine:
                 print(f"⚠ 警告：無法創建初始位置（流動性為 0）")
     
     def get_total_fees_earned(self) -> float:
-        """獲取累積的手續費收入"""
+        """獲取累積的手續費收入
+        
+        swap 只按成交前的 tick 結算手續費，這裡先按當前 tick 結算引擎持有的
+        有效位置，再與已提取的手續費匯總。
+        """
         current_price = self.amm.get_current_price()
         total = self.total_fees_earned
         
@@ -1,31 +1,436 @@
 """
 事件處理器：讀取和解析 JSONL 事件數據
 """
+import hashlib
+import io
 import json
-from typing import Iterator, Dict, Any, Optional
+import mmap
+import os
+import pickle
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, fields
+from typing import Iterable, Iterator, Dict, Any, List, Optional, Sequence, Tuple
 from pathlib import Path
 
+_READ_BUFFER_SIZE = 1 << 20
+# 超過此大小的文件在構建緩存時按字節區間分塊、多進程並行解析
+_PARALLEL_PARSE_MIN_BYTES = 64 << 20
+# 解析結果緩存格式版本；格式變化時遞增，使舊緩存失效
+_CACHE_VERSION = 6
+# 緩存指紋中參與哈希的文件首尾塊大小
+_FINGERPRINT_BLOCK = 64 << 10
+
+# 事件類型編碼（EventBatch.event_types）
+SWAP = 0
+MINT = 1
+BURN = 2
+OTHER = -1
+EVENT_TYPE_CODES = {'Swap': SWAP, 'Mint': MINT, 'Burn': BURN}
+
+
+def event_sort_key(event: Dict[str, Any]):
+    """事件排序鍵：(blockTimestamp, blockNumber, logIndex)"""
+    return (
+        event.get('blockTimestamp', 0),
+        event.get('blockNumber', 0),
+        event.get('logIndex', 0)
+    )
+
+
+def _chunk_boundaries(path: Path, size: int, num_chunks: int) -> List[int]:
+    """把文件切分為 num_chunks 個字節區間，每個內部邊界推進到下一行的行首"""
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for k in range(1, num_chunks):
+            f.seek(max(size * k // num_chunks, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return bounds
+
+
+def _scan_lines(lines: Iterable[bytes], offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """逐行解析 JSONL，返回 (行首字節偏移, 事件)；空白行跳過，無法解析或不是 JSON 對象的行打印錯誤後跳過
+    
+    注意：不使用 orjson——它會把超過 64 位的整數（sqrtPriceX96、liquidity）
+    解析成 float 而丟失精度。
+    """
+    loads = json.loads
+    for line in lines:
+        start = offset
+        offset += len(line)
+        if line.isspace():
+            continue
+        try:
+            event = loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"Error parsing line: {e}")
+            continue
+        if not isinstance(event, dict):
+            print(f"Error parsing line: expected a JSON object, got {type(event).__name__}")
+            continue
+        yield start, event
+
+
+def _build_columns(
+    scanned: Iterable[Tuple[int, Dict[str, Any]]]
+) -> Tuple['EventBatch', array, Counter]:
+    """由 (偏移, 事件) 流構建列式批次，同時記錄每行的字節偏移和事件類型計數
+    
+    單次遍歷，每個事件 dict 轉為列後即可釋放。
+    """
+    offsets = array('q')
+    by_type = Counter()
+    
+    def events():
+        for offset, event in scanned:
+            offsets.append(offset)
+            by_type[event.get('eventType', 'Unknown')] += 1
+            yield event
+    
+    batch = EventBatch.from_events(events())
+    return batch, offsets, by_type
+
+
+def _parse_chunk(path: str, start: int, end: int) -> Tuple[Dict[str, Any], array, Counter]:
+    """解析文件中 [start, end) 字節區間內的完整行（多進程工作函數，須位於模組級以便 pickle）
+    
+    返回 (列字典, 各行在文件中的字節偏移, 事件類型計數)，只把緊湊的列傳回主進程。
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    batch, offsets, by_type = _build_columns(_scan_lines(io.BytesIO(data), start))
+    return batch.to_columns(), offsets, by_type
+
+
+def _source_fingerprint(path: Path) -> Dict[str, Any]:
+    """數據文件指紋：大小、納秒 mtime 與首尾塊哈希
+    
+    緩存只在指紋完全一致時有效；不比較「緩存是否比數據新」，因為 cp -p、rsync -t、
+    git checkout 等會把內容不同的文件連同較舊的 mtime 一起換進來。
+    """
+    st = path.stat()
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(_FINGERPRINT_BLOCK))
+        if st.st_size > _FINGERPRINT_BLOCK:
+            f.seek(max(st.st_size - _FINGERPRINT_BLOCK, _FINGERPRINT_BLOCK))
+            digest.update(f.read(_FINGERPRINT_BLOCK))
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'digest': digest.hexdigest()}
+
+
+def _int_column(values: List[Any]) -> Sequence[int]:
+    """全部值都能放入 int64 時返回 array('q')，否則原樣返回 list"""
+    try:
+        return array('q', values)
+    except (OverflowError, TypeError):
+        return values
+
+
+@dataclass(slots=True)
+class EventBatch:
+    """列式（SoA）事件批次：每個字段一列，按行索引訪問，避免逐事件的 dict 查找
+    
+    整數列用緊湊的 array 存儲；tick / liquidity / amount 列在全部值都能放入 int64 時
+    同樣用 array('q')，否則（超出 64 位或含 None）回退為 list。sqrtPriceX96 為
+    uint160，保留為 list。缺失字段與 event.get(key, 默認值) 的結果一致，唯一例外是
+    tick 為 None 的行：tick 記為 0，同時 sqrtPriceX96 記為 0，使該行照舊被視為無效 Swap。
+    """
+    event_types: array      # 'b'，SWAP / MINT / BURN / OTHER
+    timestamps: array       # 'q'，blockTimestamp
+    block_numbers: array    # 'q'，blockNumber
+    log_indices: array      # 'q'，logIndex
+    sqrt_prices_x96: list   # sqrtPriceX96（可能為 None 或 0）
+    ticks: Sequence[int]    # 'q' 或 list
+    liquidities: Sequence[int]
+    amounts0: Sequence[int]
+    amounts1: Sequence[int]
+    
+    def __len__(self) -> int:
+        return len(self.event_types)
+    
+    @classmethod
+    def from_events(cls, events: Iterable[Dict[str, Any]]) -> 'EventBatch':
+        """由事件 dict 序列構建（保持原順序）
+        
+        單次遍歷逐列追加，events 可以是生成器：每個 dict 讀完即可釋放，
+        不需要先把全部事件物化為列表。
+        """
+        type_codes = EVENT_TYPE_CODES
+        event_types = array('b')
+        timestamps = array('q')
+        block_numbers = array('q')
+        log_indices = array('q')
+        sqrt_prices_x96 = []
+        ticks = []
+        liquidities = []
+        amounts0 = []
+        amounts1 = []
+        
+        for e in events:
+            event_types.append(type_codes.get(e.get('eventType'), OTHER))
+            timestamps.append(e.get('blockTimestamp') or 0)
+            block_numbers.append(e.get('blockNumber') or 0)
+            log_indices.append(e.get('logIndex') or 0)
+            tick = e.get('tick')
+            if tick is None:
+                ticks.append(0)
+                sqrt_prices_x96.append(0)
+            else:
+                ticks.append(tick)
+                sqrt_prices_x96.append(e.get('sqrtPriceX96'))
+            liquidities.append(e.get('liquidity', 0))
+            amounts0.append(e.get('amount0', 0))
+            amounts1.append(e.get('amount1', 0))
+        
+        return cls(
+            event_types=event_types,
+            timestamps=timestamps,
+            block_numbers=block_numbers,
+            log_indices=log_indices,
+            sqrt_prices_x96=sqrt_prices_x96,
+            ticks=_int_column(ticks),
+            liquidities=_int_column(liquidities),
+            amounts0=_int_column(amounts0),
+            amounts1=_int_column(amounts1),
+        )
+    
+    @classmethod
+    def concat(cls, batches: Sequence['EventBatch']) -> 'EventBatch':
+        """按順序拼接多個批次；某列在各批次中類型不一（array / list）時該列合併為 list"""
+        if not batches:
+            return cls.from_events(())
+        columns = []
+        for f in fields(cls):
+            parts = [getattr(b, f.name) for b in batches]
+            first = parts[0]
+            if isinstance(first, array) and all(
+                isinstance(p, array) and p.typecode == first.typecode for p in parts
+            ):
+                merged = array(first.typecode)
+            else:
+                merged = []
+            for part in parts:
+                merged.extend(part)
+            columns.append(merged)
+        return cls(*columns)
+    
+    def sort_order(self) -> Optional[List[int]]:
+        """按 (blockTimestamp, blockNumber, logIndex) 穩定排序的行順序，已有序時返回 None"""
+        timestamps = self.timestamps
+        block_numbers = self.block_numbers
+        log_indices = self.log_indices
+        # 線性檢查是否已有序（常見情況），有序時無需為每行構建排序鍵
+        keys = zip(timestamps, block_numbers, log_indices)
+        prev = next(keys, None)
+        for key in keys:
+            if key < prev:
+                break
+            prev = key
+        else:
+            return None
+        
+        return sorted(
+            range(len(self)),
+            key=lambda i: (timestamps[i], block_numbers[i], log_indices[i])
+        )
+    
+    def sort_rows(self) -> 'EventBatch':
+        """按 (blockTimestamp, blockNumber, logIndex) 穩定排序，已有序時直接返回自身"""
+        order = self.sort_order()
+        return self if order is None else self.take(order)
+    
+    def take(self, rows: Iterable[int]) -> 'EventBatch':
+        """按行索引取子批次；rows 為覆蓋全部行的 range 時直接返回自身，連續 range 用切片"""
+        if isinstance(rows, range) and rows.step == 1:
+            if rows.start == 0 and rows.stop >= len(self):
+                return self
+            return EventBatch(*(getattr(self, f.name)[rows.start:rows.stop] for f in fields(self)))
+        rows = list(rows)
+        columns = []
+        for f in fields(self):
+            column = getattr(self, f.name)
+            selected = [column[i] for i in rows]
+            columns.append(array(column.typecode, selected) if isinstance(column, array) else selected)
+        return EventBatch(*columns)
+    
+    def to_columns(self) -> Dict[str, Any]:
+        """轉為只含內建類型的列字典（用於 pickle 緩存，與模組導入路徑無關）"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
 
 class EventProcessor:
     """處理池子事件數據"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, use_cache: bool = True, use_mmap: bool = False):
         self.file_path = Path(file_path)
         if not self.file_path.exists():
             raise FileNotFoundError(f"Data file not found: {file_path}")
+        self.use_cache = use_cache
+        # 單進程解析時以只讀 mmap 逐行讀取，行數據直接取自頁緩存，不經過文件緩衝區複製
+        self.use_mmap = use_mmap
+        # 解析後的 pickle 緩存：<name>.cache.pkl，與數據文件同目錄
+        self.cache_path = self.file_path.with_suffix('.cache.pkl')
+        self._cached_batch: Optional[EventBatch] = None
+        # 已排序批次每行在數據文件中的行首字節偏移，按需重新解析出事件 dict
+        self._cached_offsets: Optional[array] = None
+        self._cached_stats: Optional[Dict[str, Any]] = None
+        # 載入緩存後為 True：read_events / get_events_in_range / get_event_batch 按
+        # (blockTimestamp, blockNumber, logIndex) 有序返回，調用方無需再排序
+        self.sorted: bool = False
+    
+    def _load_batch(self) -> EventBatch:
+        """載入按 (blockTimestamp, blockNumber, logIndex) 排序的列式事件批次
+        
+        優先讀取指紋與數據文件一致的 pickle 緩存；否則解析 JSONL、排序並寫入緩存。
+        緩存只含列、各行的字節偏移和事件統計，不含事件 dict；需要 dict 時按偏移
+        從數據文件重新解析對應行。結果在進程內保留，同一 EventProcessor 的後續查詢不再解析。
+        """
+        if self._cached_batch is not None:
+            return self._cached_batch
+        
+        try:
+            source = _source_fingerprint(self.file_path)
+        except OSError:
+            source = None
+        payload = self._read_cache(source)
+        if payload is not None:
+            batch = EventBatch(**payload['columns'])
+            offsets = payload['offsets']
+            stats = payload['stats']
+        else:
+            # 指紋在解析前計算：解析期間文件被改寫時，下次運行會因指紋不符而重新解析
+            batch, offsets, by_type = self._parse_all_columns()
+            order = batch.sort_order()
+            if order is not None:
+                batch = batch.take(order)
+                offsets = array('q', [offsets[i] for i in order])
+            stats = self._batch_statistics(batch, by_type)
+            if source is not None:
+                self._write_cache(source, batch, offsets, stats)
+        
+        self._cached_batch = batch
+        self._cached_offsets = offsets
+        self._cached_stats = stats
+        self.sorted = True
+        return batch
+    
+    def _read_cache(self, source: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """讀取有效的緩存，不存在、與數據文件指紋不符或損壞時返回 None
+        
+        緩存文件先寫一個只含版本和數據文件指紋的小頭部，不匹配時不必反序列化整個緩存。
+        """
+        if source is None:
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                header = pickle.load(f)
+                if (not isinstance(header, dict) or header.get('version') != _CACHE_VERSION
+                        or header.get('source') != source):
+                    return None
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+        if not isinstance(payload, dict):
+            return None
+        return payload
+    
+    def _write_cache(
+        self,
+        source: Dict[str, Any],
+        batch: EventBatch,
+        offsets: array,
+        stats: Dict[str, Any]
+    ):
+        """寫入緩存（目錄不可寫時靜默跳過）"""
+        header = {'version': _CACHE_VERSION, 'source': source}
+        payload = {
+            'columns': batch.to_columns(),
+            'offsets': offsets,
+            'stats': stats
+        }
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_path.replace(self.cache_path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
     
     def read_events(self) -> Iterator[Dict[str, Any]]:
-        """讀取所有事件（生成器）"""
-        with open(self.file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    try:
-                        event = json.loads(line)
-                        yield event
-                    except json.JSONDecodeError as e:
-                        print(f"Error parsing line: {e}")
-                        continue
+        """讀取所有事件（生成器）
+        
+        啟用緩存時按 (blockTimestamp, blockNumber, logIndex) 順序返回，
+        否則按文件順序流式解析。
+        """
+        if self.use_cache:
+            yield from self._events_at(range(len(self._load_batch())))
+        else:
+            yield from self._parse_events()
+    
+    def _events_at(self, rows: Iterable[int]) -> Iterator[Dict[str, Any]]:
+        """按已排序批次的行索引，從數據文件對應偏移處重新解析事件 dict"""
+        offsets = self._cached_offsets
+        loads = json.loads
+        with open(self.file_path, 'rb', buffering=_READ_BUFFER_SIZE) as f:
+            for i in rows:
+                f.seek(offsets[i])
+                yield loads(f.readline())
+    
+    def _parse_events(self) -> Iterator[Dict[str, Any]]:
+        """逐行解析 JSONL 文件（生成器）
+        
+        以二進制模式和 1MB 緩衝讀取，json.loads 直接解析 bytes（空白由解析器忽略）。
+        """
+        for _, event in self._scan_file():
+            yield event
+    
+    def _scan_file(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """逐行解析整個文件，返回 (行首字節偏移, 事件)"""
+        with open(self.file_path, 'rb', buffering=_READ_BUFFER_SIZE) as f:
+            if self.use_mmap and self.file_path.stat().st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    yield from _scan_lines(iter(mm.readline, b''))
+            else:
+                yield from _scan_lines(f)
+    
+    def _parse_all_columns(self) -> Tuple[EventBatch, array, Counter]:
+        """把整個文件解析為列式批次（按文件順序），附帶各行字節偏移和事件類型計數
+        
+        大文件按 CPU 數切分為以換行對齊的字節區間，由子進程並行解析為列後按原順序拼接；
+        小文件、單核或無法啟動子進程時退回單進程流式解析。兩種方式都不物化事件 dict 列表。
+        """
+        size = self.file_path.stat().st_size
+        workers = os.cpu_count() or 1
+        if size < _PARALLEL_PARSE_MIN_BYTES or workers < 2:
+            return _build_columns(self._scan_file())
+        
+        bounds = _chunk_boundaries(self.file_path, size, workers)
+        path = str(self.file_path)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(
+                    _parse_chunk, [path] * (len(bounds) - 1), bounds[:-1], bounds[1:]
+                ))
+        except (OSError, BrokenProcessPool):
+            return _build_columns(self._scan_file())
+        
+        offsets = array('q')
+        by_type = Counter()
+        for _, chunk_offsets, chunk_by_type in chunks:
+            offsets.extend(chunk_offsets)
+            by_type.update(chunk_by_type)
+        batch = EventBatch.concat([EventBatch(**columns) for columns, _, _ in chunks])
+        return batch, offsets, by_type
     
     def get_events_by_type(self, event_type: str) -> Iterator[Dict[str, Any]]:
         """按事件類型過濾"""
@@ -41,6 +446,12 @@ class EventProcessor:
         end_timestamp: Optional[int] = None
     ) -> Iterator[Dict[str, Any]]:
         """獲取指定範圍內的事件"""
+        if self.use_cache:
+            yield from self._events_at(
+                self.iter_sorted_range(start_block, end_block, start_timestamp, end_timestamp)
+            )
+            return
+        
         for event in self.read_events():
             block_num = event.get('blockNumber')
             timestamp = event.get('blockTimestamp')
@@ -56,34 +467,147 @@ class EventProcessor:
             
             yield event
     
+    def iter_sorted_range(
+        self,
+        start_block: Optional[int] = None,
+        end_block: Optional[int] = None,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None
+    ) -> Iterator[int]:
+        """惰性返回範圍內事件在已排序緩存批次（get_event_batch()）中的行索引
+        
+        只在需要時載入緩存，不複製任何列；按 (blockTimestamp, blockNumber, logIndex) 順序。
+        """
+        self._load_batch()
+        return iter(self._range_indices(start_block, end_block, start_timestamp, end_timestamp))
+    
+    def _range_indices(
+        self,
+        start_block: Optional[int],
+        end_block: Optional[int],
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int]
+    ) -> Iterable[int]:
+        """在已排序的緩存批次上定位範圍內事件的行索引
+        
+        時間戳範圍用二分查找切片（O(log N)），只有指定區塊範圍時才逐行檢查。
+        與逐事件過濾一致：缺失（為 0）的時間戳或區塊號不參與對應的過濾。
+        """
+        batch = self._cached_batch
+        timestamps = batch.timestamps
+        n = len(timestamps)
+        
+        lo = bisect_left(timestamps, start_timestamp) if start_timestamp else 0
+        hi = bisect_right(timestamps, end_timestamp) if end_timestamp else n
+        if lo == 0 and hi == n:
+            rows: Iterable[int] = range(n)
+        else:
+            # 時間戳為 0 的事件排在最前，且不受時間範圍過濾
+            zero_lo = bisect_left(timestamps, 0)
+            zero_hi = bisect_right(timestamps, 0)
+            if zero_lo == zero_hi:
+                rows = range(lo, hi)
+            elif zero_hi >= lo:
+                rows = range(zero_lo, hi)
+            else:
+                rows = [*range(zero_lo, zero_hi), *range(lo, hi)]
+        
+        if not (start_block or end_block):
+            return rows
+        
+        block_numbers = batch.block_numbers
+        return (
+            i for i in rows
+            if not (block_numbers[i] and (
+                (start_block and block_numbers[i] < start_block)
+                or (end_block and block_numbers[i] > end_block)
+            ))
+        )
+    
+    def get_event_batch(
+        self,
+        start_block: Optional[int] = None,
+        end_block: Optional[int] = None,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None
+    ) -> EventBatch:
+        """獲取指定範圍內按 (blockTimestamp, blockNumber, logIndex) 排序的列式事件批次"""
+        if self.use_cache:
+            self._load_batch()
+            rows = self._range_indices(start_block, end_block, start_timestamp, end_timestamp)
+            return self._cached_batch.take(rows)
+        
+        # 無緩存時流式構建列再按行排序，不物化事件 dict 列表
+        return EventBatch.from_events(self.get_events_in_range(
+            start_block=start_block,
+            end_block=end_block,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp
+        )).sort_rows()
+    
     def get_event_statistics(self) -> Dict[str, Any]:
-        """獲取事件統計信息"""
-        stats = {
-            'total': 0,
-            'by_type': {},
-            'block_range': {'min': None, 'max': None},
-            'timestamp_range': {'min': None, 'max': None}
-        }
+        """獲取事件統計信息
         
-        for event in self.read_events():
-            stats['total'] += 1
-            
-            event_type = event.get('eventType', 'Unknown')
-            stats['by_type'][event_type] = stats['by_type'].get(event_type, 0) + 1
+        啟用緩存時統計在構建緩存時一併算好，這裡直接返回其副本；否則單次流式遍歷文件。
+        """
+        if self.use_cache:
+            self._load_batch()
+            stats = self._cached_stats
+            return {
+                'total': stats['total'],
+                'by_type': dict(stats['by_type']),
+                'block_range': dict(stats['block_range']),
+                'timestamp_range': dict(stats['timestamp_range'])
+            }
+        
+        by_type = Counter()
+        total = 0
+        block_min = block_max = None
+        ts_min = ts_max = None
+        for event in self._parse_events():
+            total += 1
+            by_type[event.get('eventType', 'Unknown')] += 1
             
             block_num = event.get('blockNumber')
             if block_num:
-                if stats['block_range']['min'] is None or block_num < stats['block_range']['min']:
-                    stats['block_range']['min'] = block_num
-                if stats['block_range']['max'] is None or block_num > stats['block_range']['max']:
-                    stats['block_range']['max'] = block_num
+                if block_min is None or block_num < block_min:
+                    block_min = block_num
+                if block_max is None or block_num > block_max:
+                    block_max = block_num
             
             timestamp = event.get('blockTimestamp')
             if timestamp:
-                if stats['timestamp_range']['min'] is None or timestamp < stats['timestamp_range']['min']:
-                    stats['timestamp_range']['min'] = timestamp
-                if stats['timestamp_range']['max'] is None or timestamp > stats['timestamp_range']['max']:
-                    stats['timestamp_range']['max'] = timestamp
+                if ts_min is None or timestamp < ts_min:
+                    ts_min = timestamp
+                if ts_max is None or timestamp > ts_max:
+                    ts_max = timestamp
         
-        return stats
+        return {
+            'total': total,
+            'by_type': dict(by_type),
+            'block_range': {'min': block_min, 'max': block_max},
+            'timestamp_range': {'min': ts_min, 'max': ts_max}
+        }
+    
+    @staticmethod
+    def _batch_statistics(batch: EventBatch, by_type: Counter) -> Dict[str, Any]:
+        """由已排序的列式批次和事件類型計數計算統計（與 get_event_statistics 的格式相同）
+        
+        缺失（為 0）的區塊號和時間戳不參與範圍統計；時間戳列已排序，首尾即為範圍。
+        """
+        block_numbers = [b for b in batch.block_numbers if b]
+        timestamps = batch.timestamps
+        first_ts = bisect_right(timestamps, 0)
+        return {
+            'total': len(batch),
+            'by_type': dict(by_type),
+            'block_range': {
+                'min': min(block_numbers) if block_numbers else None,
+                'max': max(block_numbers) if block_numbers else None
+            },
+            'timestamp_range': {
+                'min': timestamps[first_ts] if first_ts < len(timestamps) else None,
+                'max': timestamps[-1] if first_ts < len(timestamps) else None
+            }
+        }
 
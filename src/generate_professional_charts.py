@@ -4,64 +4,127 @@
 使用真實回測數據生成高質量圖表
 """
 
+import functools
+import io
 import os
 import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, Optional, Tuple
 import json
 import csv
+import matplotlib
+import matplotlib.dates as mdates
+import matplotlib.style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 時間序列曲線最多繪製的點數（dpi=200 下更密的線段在像素上已不可分辨）
+_PLOT_MAX_POINTS = 2000
+
+# PNG 默認用 zlib level 1 快速壓縮（檔案略大，編碼快數倍）；設 FAST_PNG=0 恢復默認壓縮
+_PNG_PIL_KWARGS = {} if os.environ.get('FAST_PNG', '1') == '0' else {'compress_level': 1, 'optimize': False}
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from output_generator import lttb_indices
 
-def load_value_history(filepath: str) -> List[Tuple[datetime, float]]:
-    """從 CSV 檔案載入價值歷史"""
-    data = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                ts = int(row['timestamp'])
-                value = float(row['value_usdc'])
-                dt = datetime.fromtimestamp(ts)
-                data.append((dt, value))
-            except (ValueError, KeyError):
-                continue
-    return data
+
+def load_value_history(filepath: str):
+    """從 CSV 檔案載入價值歷史
+    
+    用 NumPy 一次性解析 timestamp / value_usdc 兩列，無法解析的行會被跳過。
+    
+    Returns:
+        (timestamps int64, values float64)
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f), [])
+    try:
+        usecols = (header.index('timestamp'), header.index('value_usdc'))
+    except ValueError:
+        return empty
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        data = np.genfromtxt(
+            filepath, delimiter=',', skip_header=1, usecols=usecols,
+            dtype=np.float64, invalid_raise=False, encoding='utf-8', ndmin=2
+        )
+    if data.size == 0:
+        return empty
+    
+    data = data[~np.isnan(data).any(axis=1)]
+    return data[:, 0].astype(np.int64), data[:, 1]
 
 
-def load_price_history(data_file: str) -> List[Tuple[datetime, float]]:
-    """從 JSONL 載入價格歷史"""
-    prices = []
-    with open(data_file, 'r', encoding='utf-8') as f:
+def iter_swaps(data_file: str) -> Iterator[Tuple[int, float]]:
+    """流式讀取 JSONL 中的 Swap 事件，逐筆產出 (timestamp, price)
+    
+    這裡只讀取 eventType / blockTimestamp / price，超過 64 位的整數字段即使
+    被 orjson 解析為 float 也不受影響，因此可用時優先使用 orjson。
+    """
+    with open(data_file, 'rb') as f:
         for line in f:
+            # 先在原始字節上粗篩，非 Swap 行無需解析（誤中的行仍由下方 eventType 檢查排除）
+            if b'"Swap"' not in line:
+                continue
             try:
-                event = json.loads(line.strip())
-                if event.get('eventType') == 'Swap':
-                    ts = event.get('blockTimestamp', 0)
-                    price = event.get('price', 0)
-                    if price > 0 and ts > 0:
-                        dt = datetime.fromtimestamp(ts)
-                        prices.append((dt, price))
-            except:
+                event = _json_loads(line)
+                if event.get('eventType') != 'Swap':
+                    continue
+                ts = event.get('blockTimestamp', 0)
+                price = event.get('price', 0)
+                if price > 0 and ts > 0:
+                    yield ts, price
+            except (ValueError, TypeError, AttributeError):
+                # ValueError 涵蓋 JSON 解析錯誤與解碼錯誤；TypeError 為字段值類型異常
                 continue
-    return prices
 
 
-def generate_professional_charts(output_dir: str = "output/all_compare"):
-    """生成專業級比較圖表"""
-    
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    import matplotlib.dates as mdates
-    import numpy as np
-    from datetime import datetime, timedelta
-    
-    # 設定專業風格
-    plt.style.use('seaborn-v0_8-whitegrid')
-    plt.rcParams.update({
+def load_price_history(data_file: str):
+    """從 JSONL 載入價格歷史
+    
+    返回按時間戳穩定排序的兩列 (timestamps: int64[N], prices: float64[N])。
+    """
+    swaps = np.fromiter(iter_swaps(data_file), dtype=[('ts', np.int64), ('price', np.float64)])
+    order = np.argsort(swaps['ts'], kind='stable')
+    return swaps['ts'][order], swaps['price'][order]
+
+
+def _readonly(*arrays):
+    for arr in arrays:
+        arr.flags.writeable = False
+    return arrays
+
+
+@functools.lru_cache(maxsize=8)
+def _load_value_history_cached(filepath: str, mtime: float):
+    """按 (路徑, 修改時間) 緩存的價值歷史，檔案未變時直接重用（返回只讀數組）"""
+    return _readonly(*load_value_history(filepath))
+
+
+@functools.lru_cache(maxsize=8)
+def _load_price_history_cached(data_file: str, mtime: float):
+    """按 (路徑, 修改時間) 緩存的價格歷史，檔案未變時直接重用（返回只讀數組）"""
+    return _readonly(*load_price_history(data_file))
+
+
+@functools.lru_cache(maxsize=1)
+def _setup_style():
+    """設定專業風格（每個進程只套用一次）"""
+    matplotlib.style.use('seaborn-v0_8-whitegrid')
+    matplotlib.rcParams.update({
         'font.size': 11,
         'axes.titlesize': 14,
         'axes.labelsize': 12,
@@ -71,7 +134,34 @@ def generate_professional_charts(output_dir: str = "output/all_compare"):
         'axes.edgecolor': '#dee2e6',
         'grid.color': '#e9ecef',
         'grid.linewidth': 0.8,
+        # 只輸出靜態 PNG，跳過字形 hinting
+        'text.hinting': 'none',
     })
+
+
+def _render_png(fig, path: str, dpi: int, bbox_inches: Optional[str] = 'tight'):
+    """將已組裝好的 Figure 輸出為 PNG（可在子進程中執行）
+    
+    先在內存中編碼，再一次寫入臨時檔並原子替換，讀取方不會看到寫了一半的圖片。
+    """
+    _setup_style()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi, bbox_inches=bbox_inches, facecolor='white',
+                edgecolor='none', pil_kwargs=_PNG_PIL_KWARGS)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(buf.getbuffer())
+    os.replace(tmp_path, path)
+
+
+def generate_professional_charts(output_dir: str = "output/all_compare", parallel: bool = True):
+    """生成專業級比較圖表
+    
+    Args:
+        output_dir: 輸出目錄
+        parallel: 是否在進程池中並行輸出 PNG（False 時逐張在主進程輸出，便於除錯）
+    """
+    _setup_style()
     
     # 顏色方案 (專業配色)
     colors = {
@@ -91,66 +181,56 @@ def generate_professional_charts(output_dir: str = "output/all_compare"):
     print("載入真實回測數據...")
     
     # Omnis AI 價值歷史
-    omnis_history = load_value_history("output/value_history.csv")
-    print(f"  Omnis AI: {len(omnis_history)} 資料點")
+    value_file = "output/value_history.csv"
+    omnis_ts, omnis_values = _load_value_history_cached(value_file, os.path.getmtime(value_file))
+    print(f"  Omnis AI: {len(omnis_ts)} 資料點")
     
-    # 價格歷史
-    price_history = load_price_history("../data/wbtc_usdc_pool_events.jsonl")
-    print(f"  價格歷史: {len(price_history)} 資料點")
+    # 價格歷史（按時間排序的時間戳 / 價格兩列）
+    price_file = "../data/wbtc_usdc_pool_events.jsonl"
+    price_ts, price_values = _load_price_history_cached(price_file, os.path.getmtime(price_file))
+    print(f"  價格歷史: {len(price_ts)} 資料點")
     
-    if not omnis_history or not price_history:
+    if not len(omnis_ts) or not len(price_ts):
         print("錯誤: 無法載入數據")
         return
     
     # 計算基準策略
     initial_capital = 10000
-    first_price = price_history[0][1]
-    last_price = price_history[-1][1]
+    first_price = float(price_values[0])
+    last_price = float(price_values[-1])
     
     # 在 Omnis AI 歷史開頭插入 $10,000 起始點
-    if omnis_history and omnis_history[0][1] != initial_capital:
+    if omnis_values[0] != initial_capital:
         # 使用第一筆資料前1秒作為起始時間
-        start_time = omnis_history[0][0] - timedelta(seconds=1)
-        omnis_history.insert(0, (start_time, initial_capital))
+        omnis_ts = np.insert(omnis_ts, 0, omnis_ts[0] - 1)
+        omnis_values = np.insert(omnis_values, 0, initial_capital)
         print(f"  已插入 $10,000 起始點")
     
     initial_btc = (initial_capital / 2) / first_price
     initial_usdc = initial_capital / 2
     
     # 創建時間對齊的數據
-    # 將價格歷史降采樣到與 omnis_history 相同的時間點
-    omnis_times = [d[0] for d in omnis_history]
-    omnis_values = [d[1] for d in omnis_history]
+    # 將價格歷史降采樣到與 Omnis AI 相同的時間點
+    # datetime64 由 matplotlib 直接在 C 層轉換，無需逐點創建 datetime 對象
+    omnis_times = omnis_ts.astype('datetime64[s]')
     
-    # 為每個 omnis 時間點找到對應的價格
-    price_dict = {}
-    for dt, price in price_history:
-        # 取最近的價格
-        key = dt.strftime('%Y-%m-%d %H')
-        price_dict[key] = price
+    # 曲線圖只繪製 LTTB 選出的點（所有序列共用同一組索引以保持時間對齊）
+    plot_idx = lttb_indices(omnis_ts.astype(np.float64), omnis_values, _PLOT_MAX_POINTS)
+    plot_times = omnis_times[plot_idx]
+    # 日期只轉換一次為 matplotlib 數值座標，各曲線圖共用（對應座標軸以 xaxis_date() 標記為日期軸）
+    plot_x = mdates.date2num(plot_times)
     
-    # 生成 HODL 和 Pure BTC 曲線
-    hodl_values = []
-    pure_btc_values = []
+    def plot_series(values):
+        # 輸出為 8 位 PNG，繪圖數據用 float32 即足夠；統計與標註仍使用 float64 原值
+        return values[plot_idx].astype(np.float32)
     
-    # 建立價格查找表（按時間順序）
-    sorted_prices = sorted(price_history, key=lambda x: x[0])
-    price_idx = 0
+    # 為每個 omnis 時間點找到對應的價格：第一個時間不早於該點的價格（超出範圍時取最後一筆）
+    price_idx = np.minimum(np.searchsorted(price_ts, omnis_ts, side='left'), len(price_ts) - 1)
+    current_prices = price_values[price_idx]
     
-    for dt, omnis_val in omnis_history:
-        # 找到最接近的價格
-        while price_idx < len(sorted_prices) - 1 and sorted_prices[price_idx][0] < dt:
-            price_idx += 1
-        
-        current_price = sorted_prices[min(price_idx, len(sorted_prices)-1)][1]
-        
-        # HODL: 50% BTC + 50% USDC
-        hodl_val = initial_btc * current_price + initial_usdc
-        hodl_values.append(hodl_val)
-        
-        # Pure BTC: 100% BTC
-        pure_btc_val = (initial_capital / first_price) * current_price
-        pure_btc_values.append(pure_btc_val)
+    # HODL: 50% BTC + 50% USDC；Pure BTC: 100% BTC
+    hodl_values = initial_btc * current_prices + initial_usdc
+    pure_btc_values = (initial_capital / first_price) * current_prices
     
     # 策略最終數據
     strategies_data = {
@@ -198,8 +278,17 @@ def generate_professional_charts(output_dir: str = "output/all_compare"):
         },
     }
     
-    start_date = omnis_times[0]
-    end_date = omnis_times[-1]
+    # 策略表按收益率排序後一次性展開為平行數組，各圖表直接切片使用
+    names = sorted(strategies_data, key=lambda k: strategies_data[k]['return_pct'], reverse=True)
+    final_values = np.array([strategies_data[k]['final_value'] for k in names])
+    returns = np.array([strategies_data[k]['return_pct'] for k in names])
+    drawdowns = np.array([strategies_data[k]['max_drawdown'] for k in names])
+    rebalances = np.array([strategies_data[k]['rebalances'] for k in names])
+    gas_costs = np.array([strategies_data[k]['gas_cost'] for k in names])
+    strategy_colors = [colors.get(n, '#888888') for n in names]
+    
+    start_date = datetime.fromtimestamp(int(omnis_ts[0]))
+    end_date = datetime.fromtimestamp(int(omnis_ts[-1]))
     btc_change = ((last_price / first_price) - 1) * 100
     
     print(f"\n回測期間: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}")
@@ -208,402 +297,361 @@ def generate_professional_charts(output_dir: str = "output/all_compare"):
     print(f"HODL 50/50: ${hodl_values[-1]:,.2f} ({strategies_data['HODL 50/50']['return_pct']:+.2f}%)")
     print(f"Pure BTC: ${pure_btc_values[-1]:,.2f} ({strategies_data['Pure BTC']['return_pct']:+.2f}%)")
     
-    # ========================================
-    # 1. 策略價值曲線比較 (使用真實數據)
-    # ========================================
-    print("\n生成策略價值曲線比較圖 (使用真實數據)...")
-    
-    fig, ax = plt.subplots(figsize=(16, 9))
-    
-    # 繪製主要策略曲線
-    ax.plot(omnis_times, omnis_values, label='Omnis AI (ATR)', 
-            color=colors['Omnis AI'], linewidth=2.5, alpha=0.95)
-    ax.plot(omnis_times, hodl_values, label='HODL 50/50', 
-            color=colors['HODL 50/50'], linewidth=2, linestyle='-', alpha=0.9)
-    ax.plot(omnis_times, pure_btc_values, label='Pure BTC', 
-            color=colors['Pure BTC'], linewidth=2, linestyle='--', alpha=0.85)
-    
-    # 模擬 Charm 和 Steer 曲線 (基於最終價值)
-    # Charm - 緩慢下降
-    charm_values = []
-    for i, (dt, _) in enumerate(omnis_history):
-        progress = i / len(omnis_history)
-        # 非線性下降
-        charm_val = initial_capital * (1 - 0.4709 * (progress ** 0.7))
-        charm_values.append(max(charm_val, strategies_data['Charm Alpha']['final_value']))
-    
-    ax.plot(omnis_times, charm_values, label='Charm Alpha Vault', 
-            color=colors['Charm Alpha'], linewidth=1.8, linestyle='-.', alpha=0.75)
-    
-    # Steer Classic - 快速下降
-    steer_classic_values = []
-    for i, (dt, _) in enumerate(omnis_history):
-        progress = i / len(omnis_history)
-        steer_val = initial_capital * np.exp(-4 * progress)
-        steer_classic_values.append(max(steer_val, 100))
-    
-    ax.plot(omnis_times, steer_classic_values, label='Steer Classic', 
-            color=colors['Steer Classic'], linewidth=1.5, linestyle=':', alpha=0.7)
-    
-    # 初始資金線
-    ax.axhline(y=initial_capital, color='#dc2626', linestyle=':', 
-               linewidth=1.5, alpha=0.7, label='Initial Capital ($10,000)')
-    
-    # 設定標籤和標題
-    ax.set_xlabel('Date', fontweight='bold', fontsize=12)
-    ax.set_ylabel('Portfolio Value (USDC)', fontweight='bold', fontsize=12)
-    ax.set_title(f'AMM Strategy Performance Comparison\n{start_date.strftime("%Y-%m-%d")} to {end_date.strftime("%Y-%m-%d")} | BTC: ${first_price:,.0f} → ${last_price:,.0f} ({btc_change:+.1f}%)', 
-                 fontweight='bold', fontsize=14)
-    
-    # 圖例
-    ax.legend(loc='lower left', framealpha=0.95, edgecolor='#dee2e6', fontsize=11)
-    
-    # Y軸範圍
-    ax.set_ylim(0, initial_capital * 1.05)
-    
-    # X軸格式
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=2))
-    plt.xticks(rotation=45, ha='right')
-    
-    # 網格
-    ax.grid(True, alpha=0.4, linestyle='-', linewidth=0.5)
-    
-    # 添加績效標註
-    # Omnis AI 最終值
-    ax.annotate(f'Omnis AI: ${omnis_values[-1]:,.0f}\n({strategies_data["Omnis AI"]["return_pct"]:+.1f}%)', 
-               xy=(omnis_times[-1], omnis_values[-1]),
-               xytext=(10, 20), textcoords='offset points',
-               fontsize=10, fontweight='bold', color=colors['Omnis AI'],
-               bbox=dict(boxstyle='round,pad=0.3', facecolor='white', edgecolor=colors['Omnis AI'], alpha=0.9))
-    
-    # HODL 最終值
-    ax.annotate(f'HODL: ${hodl_values[-1]:,.0f}\n({strategies_data["HODL 50/50"]["return_pct"]:+.1f}%)', 
-               xy=(omnis_times[-1], hodl_values[-1]),
-               xytext=(10, -30), textcoords='offset points',
-               fontsize=10, fontweight='bold', color=colors['HODL 50/50'],
-               bbox=dict(boxstyle='round,pad=0.3', facecolor='white', edgecolor=colors['HODL 50/50'], alpha=0.9))
-    
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/strategy_comparison_value.png", dpi=200, bbox_inches='tight', 
-                facecolor='white', edgecolor='none')
-    plt.close()
-    print(f"  ✓ 已保存: {output_dir}/strategy_comparison_value.png")
-    
-    # ========================================
-    # 2. 收益率對比柱狀圖
-    # ========================================
-    print("生成收益率對比圖...")
-    
-    fig, ax = plt.subplots(figsize=(12, 7))
-    
-    # 按收益率排序
-    sorted_strategies = sorted(strategies_data.items(), key=lambda x: x[1]['return_pct'], reverse=True)
-    names = [s[0] for s in sorted_strategies]
-    returns = [s[1]['return_pct'] for s in sorted_strategies]
-    bar_colors = [colors.get(n, '#888888') for n in names]
-    
-    bars = ax.barh(range(len(names)), returns, color=bar_colors, edgecolor='white', linewidth=2, height=0.7)
-    
-    ax.axvline(x=0, color='black', linewidth=1)
-    ax.set_yticks(range(len(names)))
-    ax.set_yticklabels(names, fontsize=11)
-    ax.set_xlabel('Total Return (%)', fontweight='bold')
-    ax.set_title('Strategy Total Return Comparison', fontweight='bold', fontsize=14)
-    
-    # 添加數值標籤
-    for i, (bar, ret) in enumerate(zip(bars, returns)):
-        width = bar.get_width()
-        label_x = width + 1 if width >= 0 else width - 1
-        ha = 'left' if width >= 0 else 'right'
-        ax.annotate(f'{ret:+.1f}%', 
-                   xy=(label_x, bar.get_y() + bar.get_height()/2),
-                   ha=ha, va='center', fontweight='bold', fontsize=11,
-                   color='#1f2937')
-    
-    # 添加勝者標記
-    ax.annotate('[BEST]', xy=(returns[0] + 3, 0), fontsize=12, fontweight='bold', color='#059669')
-    
-    ax.set_xlim(-110, 10)
-    ax.grid(True, axis='x', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/total_return_comparison.png", dpi=200, bbox_inches='tight',
-                facecolor='white', edgecolor='none')
-    plt.close()
-    print(f"  ✓ 已保存: {output_dir}/total_return_comparison.png")
-    
-    # ========================================
-    # 3. 最大回撤對比
-    # ========================================
-    print("生成最大回撤對比圖...")
-    
-    fig, ax = plt.subplots(figsize=(12, 7))
-    
-    drawdowns = [s[1]['max_drawdown'] for s in sorted_strategies]
-    bar_colors_dd = ['#22c55e' if d < 20 else '#f59e0b' if d < 50 else '#ef4444' for d in drawdowns]
-    
-    bars = ax.barh(range(len(names)), drawdowns, color=bar_colors_dd, edgecolor='white', linewidth=2, height=0.7)
-    
-    ax.set_yticks(range(len(names)))
-    ax.set_yticklabels(names, fontsize=11)
-    ax.set_xlabel('Maximum Drawdown (%)', fontweight='bold')
-    ax.set_title('Maximum Drawdown Comparison\n(Lower is Better)', fontweight='bold', fontsize=14)
-    
-    # 添加數值標籤
-    for bar, dd in zip(bars, drawdowns):
-        width = bar.get_width()
-        ax.annotate(f'{dd:.1f}%', 
-                   xy=(width + 1, bar.get_y() + bar.get_height()/2),
-                   ha='left', va='center', fontweight='bold', fontsize=11)
-    
-    # 添加風險區域標記
-    ax.axvline(x=20, color='#22c55e', linestyle='--', linewidth=1.5, alpha=0.7, label='Low Risk (<20%)')
-    ax.axvline(x=50, color='#f59e0b', linestyle='--', linewidth=1.5, alpha=0.7, label='Medium Risk (<50%)')
-    ax.legend(loc='lower right', fontsize=9)
-    
-    ax.grid(True, axis='x', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/crash_comparison_bar.png", dpi=200, bbox_inches='tight',
-                facecolor='white', edgecolor='none')
-    plt.close()
-    print(f"  ✓ 已保存: {output_dir}/crash_comparison_bar.png")
-    
-    # ========================================
-    # 4. 回撤曲線圖 (使用真實數據)
-    # ========================================
-    print("生成回撤曲線圖 (使用真實數據)...")
-    
-    fig, ax = plt.subplots(figsize=(16, 7))
-    
-    # 計算 Omnis AI 回撤曲線
-    omnis_peak = omnis_values[0]
-    omnis_drawdown = []
-    for val in omnis_values:
-        omnis_peak = max(omnis_peak, val)
-        dd = ((val - omnis_peak) / omnis_peak) * 100
-        omnis_drawdown.append(dd)
-    
-    # 計算 HODL 回撤曲線
-    hodl_peak = hodl_values[0]
-    hodl_drawdown = []
-    for val in hodl_values:
-        hodl_peak = max(hodl_peak, val)
-        dd = ((val - hodl_peak) / hodl_peak) * 100
-        hodl_drawdown.append(dd)
-    
-    # 計算 Pure BTC 回撤曲線
-    btc_peak = pure_btc_values[0]
-    btc_drawdown = []
-    for val in pure_btc_values:
-        btc_peak = max(btc_peak, val)
-        dd = ((val - btc_peak) / btc_peak) * 100
-        btc_drawdown.append(dd)
-    
-    # 繪製回撤曲線
-    ax.plot(omnis_times, omnis_drawdown, label='Omnis AI', color=colors['Omnis AI'], linewidth=2.5)
-    ax.plot(omnis_times, hodl_drawdown, label='HODL 50/50', color=colors['HODL 50/50'], linewidth=2)
-    ax.plot(omnis_times, btc_drawdown, label='Pure BTC', color=colors['Pure BTC'], linewidth=2, linestyle='--')
-    
-    ax.axhline(y=0, color='black', linewidth=0.5)
-    ax.fill_between(omnis_times, -100, 0, alpha=0.05, color='red')
-    
-    # 添加風險區域
-    ax.axhline(y=-20, color='#22c55e', linestyle='--', alpha=0.5, label='Low Risk Zone (-20%)')
-    ax.axhline(y=-50, color='#f59e0b', linestyle='--', alpha=0.5, label='High Risk Zone (-50%)')
-    
-    ax.set_xlabel('Date', fontweight='bold')
-    ax.set_ylabel('Drawdown (%)', fontweight='bold')
-    ax.set_title('Drawdown Curves Over Time', fontweight='bold', fontsize=14)
-    ax.legend(loc='lower left', framealpha=0.95)
-    ax.set_ylim(-55, 5)
-    ax.grid(True, alpha=0.3)
-    
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=2))
-    plt.xticks(rotation=45, ha='right')
-    
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/drawdown_comparison.png", dpi=200, bbox_inches='tight',
-                facecolor='white', edgecolor='none')
-    plt.close()
-    print(f"  ✓ 已保存: {output_dir}/drawdown_comparison.png")
-    
-    # ========================================
-    # 5. 成本效率圖
-    # ========================================
-    print("生成成本效率圖...")
-    
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-    
-    # 左圖: Rebalance 次數
-    rebalances = [s[1]['rebalances'] for s in sorted_strategies]
-    bar_colors_reb = [colors.get(n, '#888888') for n in names]
-    
-    bars1 = ax1.barh(range(len(names)), rebalances, color=bar_colors_reb, 
-                     edgecolor='white', linewidth=2, height=0.7)
-    ax1.set_yticks(range(len(names)))
-    ax1.set_yticklabels(names, fontsize=10)
-    ax1.set_xlabel('Number of Rebalances', fontweight='bold')
-    ax1.set_title('Rebalance Frequency', fontweight='bold', fontsize=12)
-    
-    for bar, reb in zip(bars1, rebalances):
-        if reb > 0:
-            ax1.annotate(f'{reb}', 
-                        xy=(bar.get_width() + 5, bar.get_y() + bar.get_height()/2),
-                        ha='left', va='center', fontweight='bold', fontsize=10)
-    
-    ax1.grid(True, axis='x', alpha=0.3)
-    
-    # 右圖: Gas 成本
-    gas_costs = [s[1]['gas_cost'] for s in sorted_strategies]
-    bar_colors_gas = ['#22c55e' if g < 1000 else '#f59e0b' if g < 5000 else '#ef4444' for g in gas_costs]
-    
-    bars2 = ax2.barh(range(len(names)), gas_costs, color=bar_colors_gas, 
-                     edgecolor='white', linewidth=2, height=0.7)
-    ax2.set_yticks(range(len(names)))
-    ax2.set_yticklabels(names, fontsize=10)
-    ax2.set_xlabel('Gas Cost (USDC)', fontweight='bold')
-    ax2.set_title('Total Gas Cost', fontweight='bold', fontsize=12)
-    
-    for bar, gas in zip(bars2, gas_costs):
-        if gas > 0:
-            ax2.annotate(f'${gas:,.0f}', 
-                        xy=(bar.get_width() + 200, bar.get_y() + bar.get_height()/2),
-                        ha='left', va='center', fontweight='bold', fontsize=10)
-    
-    ax2.grid(True, axis='x', alpha=0.3)
-    
-    plt.suptitle('Cost Efficiency Analysis', fontweight='bold', fontsize=14, y=1.02)
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/cost_efficiency.png", dpi=200, bbox_inches='tight',
-                facecolor='white', edgecolor='none')
-    plt.close()
-    print(f"  ✓ 已保存: {output_dir}/cost_efficiency.png")
-    
-    # ========================================
-    # 6. 綜合儀表板
-    # ========================================
-    print("生成綜合儀表板...")
-    
-    fig = plt.figure(figsize=(18, 14))
-    
-    # 創建子圖
-    gs = fig.add_gridspec(3, 3, hspace=0.35, wspace=0.3)
-    
-    # 標題
-    fig.suptitle('AMM Strategy Comparison Dashboard\n' + 
-                 f'{start_date.strftime("%Y-%m-%d")} to {end_date.strftime("%Y-%m-%d")} | Initial: $10,000 | BTC: {btc_change:+.1f}%', 
-                 fontsize=16, fontweight='bold', y=0.98)
-    
-    # 前4個策略用於柱狀圖
-    top_strategies = sorted_strategies[:4]
-    names_short = [s[0] for s in top_strategies]
-    
-    # 1. 最終價值柱狀圖 (左上)
-    ax1 = fig.add_subplot(gs[0, 0])
-    final_values = [s[1]['final_value'] for s in top_strategies]
-    bar_colors_fv = [colors.get(s[0], '#888888') for s in top_strategies]
-    
-    bars = ax1.bar(range(len(names_short)), final_values, color=bar_colors_fv, edgecolor='white', linewidth=1.5)
-    ax1.axhline(y=initial_capital, color='#dc2626', linestyle='--', linewidth=1.5, label='Initial')
-    ax1.set_xticks(range(len(names_short)))
-    ax1.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
-    ax1.set_ylabel('Value ($)')
-    ax1.set_title('Final Portfolio Value', fontweight='bold', fontsize=11)
-    ax1.legend(fontsize=8)
-    
-    for bar, val in zip(bars, final_values):
-        ax1.annotate(f'${val:,.0f}', xy=(bar.get_x() + bar.get_width()/2, val + 200),
-                    ha='center', fontsize=9, fontweight='bold')
-    
-    # 2. 收益率對比 (中上)
-    ax2 = fig.add_subplot(gs[0, 1])
-    returns_top = [s[1]['return_pct'] for s in top_strategies]
-    bar_colors_ret = ['#22c55e' if r >= 0 else '#ef4444' for r in returns_top]
-    
-    bars = ax2.bar(range(len(names_short)), returns_top, color=bar_colors_ret, edgecolor='white', linewidth=1.5)
-    ax2.axhline(y=0, color='black', linewidth=0.5)
-    ax2.set_xticks(range(len(names_short)))
-    ax2.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
-    ax2.set_ylabel('Return (%)')
-    ax2.set_title('Total Return', fontweight='bold', fontsize=11)
-    
-    for bar, ret in zip(bars, returns_top):
-        y = ret + 1 if ret >= 0 else ret - 3
-        ax2.annotate(f'{ret:+.1f}%', xy=(bar.get_x() + bar.get_width()/2, y),
-                    ha='center', fontsize=9, fontweight='bold')
-    
-    # 3. 最大回撤 (右上)
-    ax3 = fig.add_subplot(gs[0, 2])
-    dd_top = [s[1]['max_drawdown'] for s in top_strategies]
-    bar_colors_dd = ['#22c55e' if d < 20 else '#f59e0b' if d < 50 else '#ef4444' for d in dd_top]
-    
-    bars = ax3.bar(range(len(names_short)), dd_top, color=bar_colors_dd, edgecolor='white', linewidth=1.5)
-    ax3.set_xticks(range(len(names_short)))
-    ax3.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
-    ax3.set_ylabel('Max DD (%)')
-    ax3.set_title('Maximum Drawdown', fontweight='bold', fontsize=11)
-    
-    for bar, dd in zip(bars, dd_top):
-        ax3.annotate(f'{dd:.1f}%', xy=(bar.get_x() + bar.get_width()/2, dd + 2),
-                    ha='center', fontsize=9, fontweight='bold')
-    
-    # 4. 價值曲線 (中間跨越)
-    ax4 = fig.add_subplot(gs[1, :])
-    
-    ax4.plot(omnis_times, omnis_values, label='Omnis AI', color=colors['Omnis AI'], linewidth=2.5)
-    ax4.plot(omnis_times, hodl_values, label='HODL 50/50', color=colors['HODL 50/50'], linewidth=2)
-    ax4.plot(omnis_times, pure_btc_values, label='Pure BTC', color=colors['Pure BTC'], linewidth=2, linestyle='--')
-    ax4.plot(omnis_times, charm_values, label='Charm Alpha', color=colors['Charm Alpha'], linewidth=1.5, linestyle='-.')
-    
-    ax4.axhline(y=initial_capital, color='#dc2626', linestyle=':', linewidth=1.5, alpha=0.7)
-    ax4.set_xlabel('Date')
-    ax4.set_ylabel('Portfolio Value ($)')
-    ax4.set_title('Portfolio Value Over Time (Real Data)', fontweight='bold', fontsize=11)
-    ax4.legend(loc='upper right', fontsize=9)
-    ax4.grid(True, alpha=0.3)
-    ax4.set_ylim(0, initial_capital * 1.05)
-    ax4.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
-    
-    # 5. Gas 成本 (左下)
-    ax5 = fig.add_subplot(gs[2, 0])
-    gas_top = [s[1]['gas_cost'] for s in top_strategies]
-    bar_colors_gas = [colors.get(s[0], '#888888') for s in top_strategies]
-    
-    bars = ax5.bar(range(len(names_short)), gas_top, color=bar_colors_gas, edgecolor='white', linewidth=1.5)
-    ax5.set_xticks(range(len(names_short)))
-    ax5.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
-    ax5.set_ylabel('Gas Cost ($)')
-    ax5.set_title('Gas Costs', fontweight='bold', fontsize=11)
-    
-    for bar, gas in zip(bars, gas_top):
-        if gas > 0:
-            ax5.annotate(f'${gas:,.0f}', xy=(bar.get_x() + bar.get_width()/2, gas + 50),
-                        ha='center', fontsize=9)
-    
-    # 6. Rebalance 次數 (中下)
-    ax6 = fig.add_subplot(gs[2, 1])
-    reb_top = [s[1]['rebalances'] for s in top_strategies]
-    bar_colors_reb = [colors.get(s[0], '#888888') for s in top_strategies]
-    
-    bars = ax6.bar(range(len(names_short)), reb_top, color=bar_colors_reb, edgecolor='white', linewidth=1.5)
-    ax6.set_xticks(range(len(names_short)))
-    ax6.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
-    ax6.set_ylabel('Count')
-    ax6.set_title('Rebalance Frequency', fontweight='bold', fontsize=11)
-    
-    for bar, reb in zip(bars, reb_top):
-        if reb > 0:
-            ax6.annotate(f'{reb}', xy=(bar.get_x() + bar.get_width()/2, reb + 1),
-                        ha='center', fontsize=9)
-    
-    # 7. 總結文字 (右下)
-    ax7 = fig.add_subplot(gs[2, 2])
-    ax7.axis('off')
-    
-    summary_text = f"""
+    # PNG 編碼在子進程中進行（matplotlib 非線程安全，故使用進程池）
+    executor = ProcessPoolExecutor(max_workers=min(6, os.cpu_count() or 1)) if parallel else None
+    try:
+        pending = []
+        
+        def save_figure(fig, filename: str, bbox_inches: Optional[str] = 'tight'):
+            path = f"{output_dir}/{filename}"
+            if executor is None:
+                _render_png(fig, path, 200, bbox_inches)
+                print(f"  ✓ 已保存: {path}")
+            else:
+                pending.append((path, executor.submit(_render_png, fig, path, 200, bbox_inches)))
+        
+        # ========================================
+        # 1. 策略價值曲線比較 (使用真實數據)
+        # ========================================
+        print("\n生成策略價值曲線比較圖 (使用真實數據)...")
+        
+        fig = Figure(figsize=(16, 9))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        
+        # 繪製主要策略曲線
+        ax.plot(plot_x, plot_series(omnis_values), label='Omnis AI (ATR)', 
+                color=colors['Omnis AI'], linewidth=2.5, alpha=0.95)
+        ax.plot(plot_x, plot_series(hodl_values), label='HODL 50/50', 
+                color=colors['HODL 50/50'], linewidth=2, linestyle='-', alpha=0.9)
+        ax.plot(plot_x, plot_series(pure_btc_values), label='Pure BTC', 
+                color=colors['Pure BTC'], linewidth=2, linestyle='--', alpha=0.85)
+        
+        # 模擬 Charm 和 Steer 曲線 (基於最終價值)
+        progress = np.arange(len(omnis_ts)) / len(omnis_ts)
+        # Charm - 緩慢下降 (非線性)
+        charm_values = np.maximum(initial_capital * (1 - 0.4709 * progress ** 0.7),
+                                  strategies_data['Charm Alpha']['final_value'])
+        
+        ax.plot(plot_x, plot_series(charm_values), label='Charm Alpha Vault', 
+                color=colors['Charm Alpha'], linewidth=1.8, linestyle='-.', alpha=0.75)
+        
+        # Steer Classic - 快速下降
+        steer_classic_values = np.maximum(initial_capital * np.exp(-4 * progress), 100)
+        
+        ax.plot(plot_x, plot_series(steer_classic_values), label='Steer Classic', 
+                color=colors['Steer Classic'], linewidth=1.5, linestyle=':', alpha=0.7)
+        
+        # 初始資金線
+        ax.axhline(y=initial_capital, color='#dc2626', linestyle=':', 
+                   linewidth=1.5, alpha=0.7, label='Initial Capital ($10,000)')
+        
+        # 設定標籤和標題
+        ax.set_xlabel('Date', fontweight='bold', fontsize=12)
+        ax.set_ylabel('Portfolio Value (USDC)', fontweight='bold', fontsize=12)
+        ax.set_title(f'AMM Strategy Performance Comparison\n{start_date.strftime("%Y-%m-%d")} to {end_date.strftime("%Y-%m-%d")} | BTC: ${first_price:,.0f} → ${last_price:,.0f} ({btc_change:+.1f}%)', 
+                     fontweight='bold', fontsize=14)
+        
+        # 圖例
+        ax.legend(loc='lower left', framealpha=0.95, edgecolor='#dee2e6', fontsize=11)
+        
+        # Y軸範圍
+        ax.set_ylim(0, initial_capital * 1.05)
+        
+        # X軸格式
+        ax.xaxis_date()
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+        ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=2))
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment('right')
+        
+        # 網格
+        ax.grid(True, alpha=0.4, linestyle='-', linewidth=0.5)
+        
+        # 添加績效標註
+        # Omnis AI 最終值
+        ax.annotate(f'Omnis AI: ${omnis_values[-1]:,.0f}\n({strategies_data["Omnis AI"]["return_pct"]:+.1f}%)', 
+                   xy=(plot_x[-1], omnis_values[-1]),
+                   xytext=(10, 20), textcoords='offset points',
+                   fontsize=10, fontweight='bold', color=colors['Omnis AI'],
+                   bbox=dict(boxstyle='round,pad=0.3', facecolor='white', edgecolor=colors['Omnis AI'], alpha=0.9))
+        
+        # HODL 最終值
+        ax.annotate(f'HODL: ${hodl_values[-1]:,.0f}\n({strategies_data["HODL 50/50"]["return_pct"]:+.1f}%)', 
+                   xy=(plot_x[-1], hodl_values[-1]),
+                   xytext=(10, -30), textcoords='offset points',
+                   fontsize=10, fontweight='bold', color=colors['HODL 50/50'],
+                   bbox=dict(boxstyle='round,pad=0.3', facecolor='white', edgecolor=colors['HODL 50/50'], alpha=0.9))
+        
+        fig.tight_layout()
+        save_figure(fig, "strategy_comparison_value.png")
+        
+        # ========================================
+        # 2. 收益率對比柱狀圖
+        # ========================================
+        print("生成收益率對比圖...")
+        
+        fig = Figure(figsize=(12, 7))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        
+        # 按收益率排序
+        bars = ax.barh(range(len(names)), returns, color=strategy_colors, edgecolor='white', linewidth=2, height=0.7)
+        
+        ax.axvline(x=0, color='black', linewidth=1)
+        ax.set_yticks(range(len(names)))
+        ax.set_yticklabels(names, fontsize=11)
+        ax.set_xlabel('Total Return (%)', fontweight='bold')
+        ax.set_title('Strategy Total Return Comparison', fontweight='bold', fontsize=14)
+        
+        # 添加數值標籤
+        ax.bar_label(bars, labels=[f'{ret:+.1f}%' for ret in returns], padding=3,
+                     fontweight='bold', fontsize=11, color='#1f2937')
+        
+        # 添加勝者標記
+        ax.annotate('[BEST]', xy=(returns[0] + 3, 0), fontsize=12, fontweight='bold', color='#059669')
+        
+        ax.set_xlim(-110, 10)
+        ax.grid(True, axis='x', alpha=0.3)
+        
+        fig.tight_layout()
+        save_figure(fig, "total_return_comparison.png")
+        
+        # ========================================
+        # 3. 最大回撤對比
+        # ========================================
+        print("生成最大回撤對比圖...")
+        
+        fig = Figure(figsize=(12, 7))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        
+        bar_colors_dd = ['#22c55e' if d < 20 else '#f59e0b' if d < 50 else '#ef4444' for d in drawdowns]
+        
+        bars = ax.barh(range(len(names)), drawdowns, color=bar_colors_dd, edgecolor='white', linewidth=2, height=0.7)
+        
+        ax.set_yticks(range(len(names)))
+        ax.set_yticklabels(names, fontsize=11)
+        ax.set_xlabel('Maximum Drawdown (%)', fontweight='bold')
+        ax.set_title('Maximum Drawdown Comparison\n(Lower is Better)', fontweight='bold', fontsize=14)
+        
+        # 添加數值標籤
+        ax.bar_label(bars, labels=[f'{dd:.1f}%' for dd in drawdowns], padding=3,
+                     fontweight='bold', fontsize=11)
+        
+        # 添加風險區域標記
+        ax.axvline(x=20, color='#22c55e', linestyle='--', linewidth=1.5, alpha=0.7, label='Low Risk (<20%)')
+        ax.axvline(x=50, color='#f59e0b', linestyle='--', linewidth=1.5, alpha=0.7, label='Medium Risk (<50%)')
+        ax.legend(loc='lower right', fontsize=9)
+        
+        ax.grid(True, axis='x', alpha=0.3)
+        
+        fig.tight_layout()
+        save_figure(fig, "crash_comparison_bar.png")
+        
+        # ========================================
+        # 4. 回撤曲線圖 (使用真實數據)
+        # ========================================
+        print("生成回撤曲線圖 (使用真實數據)...")
+        
+        fig = Figure(figsize=(16, 7))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        
+        # 回撤曲線: (價值 - 歷史峰值) / 歷史峰值
+        omnis_peaks = np.maximum.accumulate(omnis_values)
+        omnis_drawdown = (omnis_values - omnis_peaks) / omnis_peaks * 100.0
+        hodl_peaks = np.maximum.accumulate(hodl_values)
+        hodl_drawdown = (hodl_values - hodl_peaks) / hodl_peaks * 100.0
+        btc_peaks = np.maximum.accumulate(pure_btc_values)
+        btc_drawdown = (pure_btc_values - btc_peaks) / btc_peaks * 100.0
+        
+        # 繪製回撤曲線
+        ax.plot(plot_x, plot_series(omnis_drawdown), label='Omnis AI', color=colors['Omnis AI'], linewidth=2.5)
+        ax.plot(plot_x, plot_series(hodl_drawdown), label='HODL 50/50', color=colors['HODL 50/50'], linewidth=2)
+        ax.plot(plot_x, plot_series(btc_drawdown), label='Pure BTC', color=colors['Pure BTC'], linewidth=2, linestyle='--')
+        
+        ax.axhline(y=0, color='black', linewidth=0.5)
+        ax.fill_between(plot_x, -100, 0, alpha=0.05, color='red')
+        
+        # 添加風險區域
+        ax.axhline(y=-20, color='#22c55e', linestyle='--', alpha=0.5, label='Low Risk Zone (-20%)')
+        ax.axhline(y=-50, color='#f59e0b', linestyle='--', alpha=0.5, label='High Risk Zone (-50%)')
+        
+        ax.set_xlabel('Date', fontweight='bold')
+        ax.set_ylabel('Drawdown (%)', fontweight='bold')
+        ax.set_title('Drawdown Curves Over Time', fontweight='bold', fontsize=14)
+        ax.legend(loc='lower left', framealpha=0.95)
+        ax.set_ylim(-55, 5)
+        ax.grid(True, alpha=0.3)
+        
+        ax.xaxis_date()
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+        ax.xaxis.set_major_locator(mdates.WeekdayLocator(interval=2))
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment('right')
+        
+        fig.tight_layout()
+        save_figure(fig, "drawdown_comparison.png")
+        
+        # ========================================
+        # 5. 成本效率圖
+        # ========================================
+        print("生成成本效率圖...")
+        
+        fig = Figure(figsize=(14, 6))
+        FigureCanvasAgg(fig)
+        ax1, ax2 = fig.subplots(1, 2)
+        
+        # 左圖: Rebalance 次數
+        bars1 = ax1.barh(range(len(names)), rebalances, color=strategy_colors, 
+                         edgecolor='white', linewidth=2, height=0.7)
+        ax1.set_yticks(range(len(names)))
+        ax1.set_yticklabels(names, fontsize=10)
+        ax1.set_xlabel('Number of Rebalances', fontweight='bold')
+        ax1.set_title('Rebalance Frequency', fontweight='bold', fontsize=12)
+        
+        ax1.bar_label(bars1, labels=[f'{reb}' if reb > 0 else '' for reb in rebalances], padding=3,
+                      fontweight='bold', fontsize=10)
+        
+        ax1.grid(True, axis='x', alpha=0.3)
+        
+        # 右圖: Gas 成本
+        bar_colors_gas = ['#22c55e' if g < 1000 else '#f59e0b' if g < 5000 else '#ef4444' for g in gas_costs]
+        
+        bars2 = ax2.barh(range(len(names)), gas_costs, color=bar_colors_gas, 
+                         edgecolor='white', linewidth=2, height=0.7)
+        ax2.set_yticks(range(len(names)))
+        ax2.set_yticklabels(names, fontsize=10)
+        ax2.set_xlabel('Gas Cost (USDC)', fontweight='bold')
+        ax2.set_title('Total Gas Cost', fontweight='bold', fontsize=12)
+        
+        ax2.bar_label(bars2, labels=[f'${gas:,.0f}' if gas > 0 else '' for gas in gas_costs], padding=3,
+                      fontweight='bold', fontsize=10)
+        
+        ax2.grid(True, axis='x', alpha=0.3)
+        
+        fig.suptitle('Cost Efficiency Analysis', fontweight='bold', fontsize=14, y=1.02)
+        fig.tight_layout()
+        save_figure(fig, "cost_efficiency.png")
+        
+        # ========================================
+        # 6. 綜合儀表板
+        # ========================================
+        print("生成綜合儀表板...")
+        
+        # constrained layout 單次計算各面板位置（含總標題），輸出時無需再做 bbox_inches='tight'
+        fig = Figure(figsize=(18, 14), layout='constrained')
+        FigureCanvasAgg(fig)
+        
+        # 創建子圖
+        gs = fig.add_gridspec(3, 3)
+        
+        # 標題
+        fig.suptitle('AMM Strategy Comparison Dashboard\n' + 
+                     f'{start_date.strftime("%Y-%m-%d")} to {end_date.strftime("%Y-%m-%d")} | Initial: $10,000 | BTC: {btc_change:+.1f}%', 
+                     fontsize=16, fontweight='bold')
+        
+        # 前4個策略用於柱狀圖
+        top_n = 4
+        names_short = names[:top_n]
+        colors_short = strategy_colors[:top_n]
+        
+        # 1. 最終價值柱狀圖 (左上)
+        ax1 = fig.add_subplot(gs[0, 0])
+        final_values_top = final_values[:top_n]
+        
+        bars = ax1.bar(range(len(names_short)), final_values_top, color=colors_short, edgecolor='white', linewidth=1.5)
+        ax1.axhline(y=initial_capital, color='#dc2626', linestyle='--', linewidth=1.5, label='Initial')
+        ax1.set_xticks(range(len(names_short)))
+        ax1.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
+        ax1.set_ylabel('Value ($)')
+        ax1.set_title('Final Portfolio Value', fontweight='bold', fontsize=11)
+        ax1.legend(fontsize=8)
+        
+        ax1.bar_label(bars, labels=[f'${val:,.0f}' for val in final_values_top], padding=2,
+                      fontsize=9, fontweight='bold')
+        
+        # 2. 收益率對比 (中上)
+        ax2 = fig.add_subplot(gs[0, 1])
+        returns_top = returns[:top_n]
+        bar_colors_ret = ['#22c55e' if r >= 0 else '#ef4444' for r in returns_top]
+        
+        bars = ax2.bar(range(len(names_short)), returns_top, color=bar_colors_ret, edgecolor='white', linewidth=1.5)
+        ax2.axhline(y=0, color='black', linewidth=0.5)
+        ax2.set_xticks(range(len(names_short)))
+        ax2.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
+        ax2.set_ylabel('Return (%)')
+        ax2.set_title('Total Return', fontweight='bold', fontsize=11)
+        
+        ax2.bar_label(bars, labels=[f'{ret:+.1f}%' for ret in returns_top], padding=2,
+                      fontsize=9, fontweight='bold')
+        
+        # 3. 最大回撤 (右上)
+        ax3 = fig.add_subplot(gs[0, 2])
+        dd_top = drawdowns[:top_n]
+        bar_colors_dd = ['#22c55e' if d < 20 else '#f59e0b' if d < 50 else '#ef4444' for d in dd_top]
+        
+        bars = ax3.bar(range(len(names_short)), dd_top, color=bar_colors_dd, edgecolor='white', linewidth=1.5)
+        ax3.set_xticks(range(len(names_short)))
+        ax3.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
+        ax3.set_ylabel('Max DD (%)')
+        ax3.set_title('Maximum Drawdown', fontweight='bold', fontsize=11)
+        
+        ax3.bar_label(bars, labels=[f'{dd:.1f}%' for dd in dd_top], padding=2,
+                      fontsize=9, fontweight='bold')
+        
+        # 4. 價值曲線 (中間跨越)
+        ax4 = fig.add_subplot(gs[1, :])
+        
+        ax4.plot(plot_x, plot_series(omnis_values), label='Omnis AI', color=colors['Omnis AI'], linewidth=2.5)
+        ax4.plot(plot_x, plot_series(hodl_values), label='HODL 50/50', color=colors['HODL 50/50'], linewidth=2)
+        ax4.plot(plot_x, plot_series(pure_btc_values), label='Pure BTC', color=colors['Pure BTC'], linewidth=2, linestyle='--')
+        ax4.plot(plot_x, plot_series(charm_values), label='Charm Alpha', color=colors['Charm Alpha'], linewidth=1.5, linestyle='-.')
+        
+        ax4.axhline(y=initial_capital, color='#dc2626', linestyle=':', linewidth=1.5, alpha=0.7)
+        ax4.set_xlabel('Date')
+        ax4.set_ylabel('Portfolio Value ($)')
+        ax4.set_title('Portfolio Value Over Time (Real Data)', fontweight='bold', fontsize=11)
+        ax4.legend(loc='upper right', fontsize=9)
+        ax4.grid(True, alpha=0.3)
+        ax4.set_ylim(0, initial_capital * 1.05)
+        ax4.xaxis_date()
+        ax4.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
+        
+        # 5. Gas 成本 (左下)
+        ax5 = fig.add_subplot(gs[2, 0])
+        gas_top = gas_costs[:top_n]
+        
+        bars = ax5.bar(range(len(names_short)), gas_top, color=colors_short, edgecolor='white', linewidth=1.5)
+        ax5.set_xticks(range(len(names_short)))
+        ax5.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
+        ax5.set_ylabel('Gas Cost ($)')
+        ax5.set_title('Gas Costs', fontweight='bold', fontsize=11)
+        
+        ax5.bar_label(bars, labels=[f'${gas:,.0f}' if gas > 0 else '' for gas in gas_top], padding=2,
+                      fontsize=9)
+        
+        # 6. Rebalance 次數 (中下)
+        ax6 = fig.add_subplot(gs[2, 1])
+        reb_top = rebalances[:top_n]
+        
+        bars = ax6.bar(range(len(names_short)), reb_top, color=colors_short, edgecolor='white', linewidth=1.5)
+        ax6.set_xticks(range(len(names_short)))
+        ax6.set_xticklabels(names_short, rotation=45, ha='right', fontsize=9)
+        ax6.set_ylabel('Count')
+        ax6.set_title('Rebalance Frequency', fontweight='bold', fontsize=11)
+        
+        ax6.bar_label(bars, labels=[f'{reb}' if reb > 0 else '' for reb in reb_top], padding=2,
+                      fontsize=9)
+        
+        # 7. 總結文字 (右下)
+        ax7 = fig.add_subplot(gs[2, 2])
+        ax7.axis('off')
+        
+        summary_text = f"""
     === Key Findings ===
     
     [WINNER] HODL 50/50 ({strategies_data['HODL 50/50']['return_pct']:+.1f}%)
@@ -622,23 +670,30 @@ def generate_professional_charts(output_dir: str = "output/all_compare"):
     passive strategies performed
     better than active ones.
     """
-    
-    ax7.text(0.1, 0.9, summary_text, transform=ax7.transAxes, fontsize=10,
-             verticalalignment='top', fontfamily='monospace',
-             bbox=dict(boxstyle='round', facecolor='#f0f9ff', edgecolor='#3b82f6', alpha=0.9))
-    
-    plt.savefig(f"{output_dir}/strategy_dashboard.png", dpi=200, bbox_inches='tight',
-                facecolor='white', edgecolor='none')
-    plt.close()
-    print(f"  ✓ 已保存: {output_dir}/strategy_dashboard.png")
+        
+        ax7.text(0.1, 0.9, summary_text, transform=ax7.transAxes, fontsize=10,
+                 verticalalignment='top', fontfamily='monospace',
+                 bbox=dict(boxstyle='round', facecolor='#f0f9ff', edgecolor='#3b82f6', alpha=0.9))
+        
+        save_figure(fig, "strategy_dashboard.png", bbox_inches=None)
+        
+        if executor is not None:
+            for path, future in pending:
+                future.result()
+                print(f"  ✓ 已保存: {path}")
+    finally:
+        if executor is not None:
+            # 構建圖表中途出錯時取消尚未開始的渲染任務，並關閉進程池
+            executor.shutdown(cancel_futures=True)
     
     print(f"\n✅ 所有專業圖表已生成至 {output_dir}/")
-    print(f"   使用了 {len(omnis_history)} 個真實資料點")
+    print(f"   使用了 {len(omnis_ts)} 個真實資料點")
 
 
 if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != '--singlecore']
     output_dir = "output/all_compare"
-    if len(sys.argv) > 1:
-        output_dir = sys.argv[1]
+    if args:
+        output_dir = args[0]
     
-    generate_professional_charts(output_dir)
+    generate_professional_charts(output_dir, parallel='--singlecore' not in sys.argv)
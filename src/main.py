@@ -3,15 +3,8 @@ AMM 回測系統主程序
 """
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-try:
-    from .backtest_engine import BacktestEngine
-    from .performance_analyzer import PerformanceAnalyzer
-    from .output_generator import OutputGenerator
-except ImportError:
-    from backtest_engine import BacktestEngine
-    from performance_analyzer import PerformanceAnalyzer
-    from output_generator import OutputGenerator
 
 
 def main():
@@ -121,6 +114,11 @@ def main():
         default=180,
         help='Rebalance 檢查間隔（秒，默認 180 = 3分鐘）'
     )
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='以 mmap 只讀映射數據文件進行解析（僅在需要重新解析、即無有效緩存時生效）'
+    )
     
     args = parser.parse_args()
     
@@ -134,6 +132,16 @@ def main():
         print(f"錯誤：數據文件不存在: {args.data}")
         sys.exit(1)
     
+    # 回測模組在參數校驗通過後才導入，--help 與參數錯誤時無需載入
+    try:
+        from .backtest_engine import BacktestEngine
+        from .performance_analyzer import PerformanceAnalyzer
+        from .output_generator import OutputGenerator
+    except ImportError:
+        from backtest_engine import BacktestEngine
+        from performance_analyzer import PerformanceAnalyzer
+        from output_generator import OutputGenerator
+    
     print("=" * 60)
     print("AMM 回測系統")
     print("=" * 60)
@@ -144,7 +152,8 @@ def main():
     # 創建回測引擎
     engine = BacktestEngine(
         data_file=str(data_path.absolute()),
-        initial_capital=args.capital
+        initial_capital=args.capital,
+        use_mmap=args.mmap
     )
     
     # 執行回測
@@ -189,28 +198,21 @@ def main():
         if export_csv or export_plots or export_json:
             print(f"\n導出文件到: {args.output_dir}/")
         
-        if export_csv:
-            value_csv = output_gen.export_value_history_csv(engine.get_value_history())
-            price_csv = output_gen.export_price_history_csv(engine.get_price_history())
-            metrics_csv = output_gen.export_metrics_csv(metrics)
-            exported_files.extend([value_csv, price_csv, metrics_csv])
-            print(f"  ✓ CSV 文件已導出 (3 個文件)")
-        
-        if export_json:
-            metrics_json = output_gen.export_metrics_json(metrics)
-            exported_files.append(metrics_json)
-            print(f"  ✓ JSON 文件已導出")
+        # 歷史序列只取一次，各導出任務共用同一對象（圖表的數組轉換也按對象緩存）
+        value_hist = engine.get_value_history()
+        price_hist = engine.get_price_history()
         
-        if export_plots:
-            # 生成基本圖表
+        # 各導出任務互不依賴，提交到線程池並行執行；結果按原順序收集，異常經 result() 拋出
+        # 圖表依賴 pyplot 全局狀態，基本圖表與 ATR 範圍圖在同一任務中順序生成
+        def export_plot_files():
             plot_files = output_gen.export_plots(
-                engine.get_value_history(),
-                engine.get_price_history(),
+                value_hist,
+                price_hist,
                 metrics
             )
-            exported_files.extend(plot_files)
             
             # 如果使用 ATR 策略，生成帶有指標面板的 ATR 範圍圖
+            atr_plot, atr_error = None, None
             if args.use_atr and hasattr(engine, 'atr_range_history') and engine.atr_range_history:
                 try:
                     rebalance_history = None
@@ -218,25 +220,53 @@ def main():
                         rebalance_history = engine.rebalance_history
                     
                     atr_plot = output_gen.plot_price_with_atr_range(
-                        price_history=engine.get_price_history(),
+                        price_history=price_hist,
                         atr_range_history=engine.atr_range_history,
                         rebalance_history=rebalance_history,
                         metrics=metrics,
                         initial_capital=args.capital,
-                        value_history=engine.get_value_history()
+                        value_history=value_hist
                     )
-                    if atr_plot:
-                        exported_files.append(atr_plot)
-                        print(f"  ✓ 價格與 ATR 範圍圖（含指標面板）已導出")
                 except Exception as e:
-                    print(f"  ⚠ 生成 ATR 範圍圖時發生錯誤: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    atr_error = e
+            return plot_files, atr_plot, atr_error
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            if export_csv:
+                csv_futures = [
+                    pool.submit(output_gen.export_value_history_csv, value_hist),
+                    pool.submit(output_gen.export_price_history_csv, price_hist),
+                    pool.submit(output_gen.export_metrics_csv, metrics),
+                ]
+            if export_json:
+                json_future = pool.submit(output_gen.export_metrics_json, metrics)
+            if export_plots:
+                plot_future = pool.submit(export_plot_files)
+            
+            if export_csv:
+                exported_files.extend(future.result() for future in csv_futures)
+                print(f"  ✓ CSV 文件已導出 (3 個文件)")
             
-            if plot_files:
-                print(f"  ✓ 圖表已導出 ({len(plot_files)} 個)")
-            else:
-                print(f"  ⚠ 無法生成圖表（需要安裝 matplotlib: pip install matplotlib）")
+            if export_json:
+                exported_files.append(json_future.result())
+                print(f"  ✓ JSON 文件已導出")
+            
+            if export_plots:
+                plot_files, atr_plot, atr_error = plot_future.result()
+                exported_files.extend(plot_files)
+                
+                if atr_plot:
+                    exported_files.append(atr_plot)
+                    print(f"  ✓ 價格與 ATR 範圍圖（含指標面板）已導出")
+                if atr_error is not None:
+                    print(f"  ⚠ 生成 ATR 範圍圖時發生錯誤: {atr_error}")
+                    import traceback
+                    traceback.print_exception(type(atr_error), atr_error, atr_error.__traceback__)
+                
+                if plot_files:
+                    print(f"  ✓ 圖表已導出 ({len(plot_files)} 個)")
+                else:
+                    print(f"  ⚠ 無法生成圖表（需要安裝 matplotlib: pip install matplotlib）")
         
         if exported_files:
             print(f"\n所有文件已保存到: {args.output_dir}/")
@@ -2,10 +2,11 @@
 輸出生成器：生成 CSV、圖片和日誌文件
 """
 import csv
+import functools
 import json
+import time
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Tuple, Dict, Any, Iterable, Iterator, Optional
 
 try:
     from .performance_analyzer import PerformanceMetrics
@@ -13,12 +14,137 @@ except ImportError:
     from performance_analyzer import PerformanceMetrics
 
 
+@functools.lru_cache(maxsize=1)
+def _load_matplotlib():
+    """首次繪圖時才導入 matplotlib（可選依賴，只導入一次）並設定長曲線的 Agg 繪製參數
+    
+    Returns:
+        (plt, mdates, np)；未安裝 matplotlib 時返回 None
+    """
+    try:
+        import matplotlib
+        matplotlib.use('Agg')  # 非交互式後端
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+        import numpy as np
+    except ImportError:
+        return None
+    matplotlib.rcParams['path.simplify'] = True
+    matplotlib.rcParams['path.simplify_threshold'] = 1.0
+    matplotlib.rcParams['agg.path.chunksize'] = 10000
+    return plt, mdates, np
+
+
+# orjson 為可選依賴：可用時以 C 實現序列化 JSON（結構與縮排同 json.dumps(indent=2, ensure_ascii=False)，
+# 僅科學記數法寫法不同，如 1e-7 與 1e-07）
+try:
+    import orjson
+    
+    def _dumps_json(data: Dict[str, Any]) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _dumps_json(data: Dict[str, Any]) -> bytes:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+# CSV 寫入緩衝區大小
+_CSV_BUFFER_SIZE = 1 << 20
+
+
+def iter_local_datetimes(timestamps: Iterable[int]) -> Iterator[str]:
+    """逐個生成時間戳的本地時間字串（'%Y-%m-%d %H:%M:%S'），所有輸出 CSV 共用
+    
+    時區偏移均為整分鐘，同一分鐘內的本地時間只差秒數：每分鐘只調用一次 strftime 生成
+    「YYYY-MM-DD HH:MM:」前綴，秒數直接由 timestamp 取模得到。
+    """
+    strftime, localtime = time.strftime, time.localtime
+    current_minute = None
+    prefix = ''
+    for timestamp in timestamps:
+        minute, second = divmod(timestamp, 60)
+        if minute != current_minute:
+            current_minute = minute
+            prefix = strftime('%Y-%m-%d %H:%M:', localtime(timestamp - second))
+        yield f"{prefix}{second:02d}"
+
+
+def _history_csv_lines(history: List[Tuple[int, float]]) -> Iterator[str]:
+    """逐行生成 (timestamp, 本地時間, value) CSV 行"""
+    datetimes = iter_local_datetimes(timestamp for timestamp, _ in history)
+    for (timestamp, value), dt in zip(history, datetimes):
+        yield f"{timestamp},{dt},{value:.2f}\r\n"
+
+
+def lttb_indices(x, y, n_out: int):
+    """Largest-Triangle-Three-Buckets 降采樣，返回保留點的索引（含首尾兩點）
+    
+    每個桶保留與「上一個保留點」及「下一個桶均值點」構成最大三角形面積的點，
+    在點數遠超像素寬度時保持曲線的視覺形狀。需要 numpy。
+    """
+    import numpy as np
+    
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    # 首尾之間的 n_out - 2 個桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        avg_x = x[hi:edges[i + 2]].mean()
+        avg_y = y[hi:edges[i + 2]].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def _plot_points(fig_width_in: float, dpi: int) -> int:
+    """曲線最多保留的點數：約為輸出像素寬度的 4 倍"""
+    return int(fig_width_in * dpi * 4)
+
+
+def _write_history_csv(filepath: Path, header: List[str], history: List[Tuple[int, float]]) -> None:
+    """寫出 (timestamp, datetime, value) 三列的歷史 CSV
+    
+    三個字段都不需要引號轉義，直接格式化整行後批量寫入，省去 csv.writer 的逐字段處理；
+    行尾沿用 csv 模組默認的 \r\n，輸出與 csv.writer 完全一致。
+    """
+    with open(filepath, 'w', newline='', encoding='utf-8', buffering=_CSV_BUFFER_SIZE) as f:
+        f.write(','.join(header) + '\r\n')
+        f.writelines(_history_csv_lines(history))
+
+
 class OutputGenerator:
     """輸出生成器"""
     
-    def __init__(self, output_dir: str = "output"):
+    def __init__(self, output_dir: str = "output", atr_plot_dpi: int = 150):
+        """
+        Args:
+            output_dir: 輸出目錄
+            atr_plot_dpi: 價格/ATR 範圍疊圖的輸出 DPI（18x10 英寸，150 即 2700x1500 像素）
+        """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.atr_plot_dpi = atr_plot_dpi
+        # id(history) -> (history, float64 數組)；同一序列在多張圖之間只轉換一次
+        self._array_cache: Dict[int, Tuple[Any, Any]] = {}
+    
+    def _history_array(self, history):
+        """將 [(timestamp, v1, ...), ...] 轉為 float64 二維數組（按序列對象緩存）"""
+        cached = self._array_cache.get(id(history))
+        if cached is not None and cached[0] is history:
+            return cached[1]
+        import numpy as np
+        
+        arr = np.asarray(history, dtype=np.float64)
+        self._array_cache[id(history)] = (history, arr)
+        return arr
     
     def export_value_history_csv(
         self,
@@ -27,15 +153,7 @@ class OutputGenerator:
     ) -> str:
         """導出價值歷史到 CSV"""
         filepath = self.output_dir / filename
-        
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['timestamp', 'datetime', 'value_usdc'])
-            
-            for timestamp, value in value_history:
-                dt = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                writer.writerow([timestamp, dt, f"{value:.2f}"])
-        
+        _write_history_csv(filepath, ['timestamp', 'datetime', 'value_usdc'], value_history)
         return str(filepath)
     
     def export_price_history_csv(
@@ -45,15 +163,7 @@ class OutputGenerator:
     ) -> str:
         """導出價格歷史到 CSV"""
         filepath = self.output_dir / filename
-        
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['timestamp', 'datetime', 'price_usdc'])
-            
-            for timestamp, price in price_history:
-                dt = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                writer.writerow([timestamp, dt, f"{price:.2f}"])
-        
+        _write_history_csv(filepath, ['timestamp', 'datetime', 'price_usdc'], price_history)
         return str(filepath)
     
     def export_metrics_csv(
@@ -119,8 +229,8 @@ class OutputGenerator:
             }
         }
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(filepath, 'wb') as f:
+            f.write(_dumps_json(data))
         
         return str(filepath)
     
@@ -133,79 +243,83 @@ class OutputGenerator:
         atr_range_history: Optional[List[Tuple[int, float, float, float, float]]] = None
     ) -> List[str]:
         """生成圖表（需要 matplotlib）"""
-        try:
-            import matplotlib
-            matplotlib.use('Agg')  # 非交互式後端
-            import matplotlib.pyplot as plt
-            import matplotlib.dates as mdates
-            from datetime import datetime
-        except ImportError:
+        mpl = _load_matplotlib()
+        if mpl is None:
             print("警告：matplotlib 未安裝，無法生成圖表")
             print("請運行: pip install matplotlib")
             return []
+        plt, mdates, np = mpl
         
         filepaths = []
         
-        # 1. 價值歷史圖
-        if value_history:
-            fig, ax = plt.subplots(figsize=(12, 6))
-            timestamps = [ts for ts, _ in value_history]
-            values = [v for _, v in value_history]
-            dates = [datetime.fromtimestamp(ts) for ts in timestamps]
-            
-            ax.plot(dates, values, linewidth=2, label='Portfolio Value')
-            ax.axhline(y=values[0] if values else 0, color='r', linestyle='--', alpha=0.5, label='Initial Capital')
-            ax.set_xlabel('Date')
-            ax.set_ylabel('Value (USDC)')
-            ax.set_title('Portfolio Value Over Time')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            
-            filepath = self.output_dir / f"{prefix}_value_history.png"
-            plt.savefig(filepath, dpi=150, bbox_inches='tight')
-            plt.close()
-            filepaths.append(str(filepath))
-        
-        # 2. 價格歷史圖
-        if price_history:
-            fig, ax = plt.subplots(figsize=(12, 6))
-            timestamps = [ts for ts, _ in price_history]
-            prices = [p for _, p in price_history]
-            dates = [datetime.fromtimestamp(ts) for ts in timestamps]
-            
-            ax.plot(dates, prices, linewidth=1.5, color='green', alpha=0.7, label='WBTC/USDC Price')
-            ax.set_xlabel('Date')
-            ax.set_ylabel('Price (USDC)')
-            ax.set_title('WBTC/USDC Price Over Time')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-            plt.xticks(rotation=45)
-            plt.tight_layout()
+        # 三張圖共用同一個 Figure，每張保存後 clf() 重置（佈局引擎保留）
+        # constrained 佈局在繪製時一次求解，省去 tight_layout 額外的一輪測量繪製
+        fig = plt.figure(figsize=(12, 6), layout='constrained')
+        try:
+            # 1. 價值歷史圖
+            if value_history:
+                ax = fig.add_subplot(111)
+                # datetime64 由 matplotlib 直接轉換，無需逐點創建 datetime 對象
+                arr = self._history_array(value_history)
+                values = arr[:, 1]
+                idx = lttb_indices(arr[:, 0], values, _plot_points(12, 150))
+                dates = arr[idx, 0].astype(np.int64).astype('datetime64[s]')
+                values = values[idx]
+                
+                ax.plot(dates, values, linewidth=2, label='Portfolio Value')
+                ax.axhline(y=values[0], color='r', linestyle='--', alpha=0.5, label='Initial Capital')
+                ax.set_xlabel('Date')
+                ax.set_ylabel('Value (USDC)')
+                ax.set_title('Portfolio Value Over Time')
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+                ax.tick_params(axis='x', labelrotation=45)
+                
+                filepath = self.output_dir / f"{prefix}_value_history.png"
+                fig.savefig(filepath, dpi=150, bbox_inches='tight')
+                fig.clf()
+                filepaths.append(str(filepath))
             
-            filepath = self.output_dir / f"{prefix}_price_history.png"
-            plt.savefig(filepath, dpi=150, bbox_inches='tight')
-            plt.close()
-            filepaths.append(str(filepath))
-        
-        # 3. 收益率分佈圖
-        if metrics.return_history:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.hist(metrics.return_history, bins=50, alpha=0.7, edgecolor='black')
-            ax.axvline(x=0, color='r', linestyle='--', alpha=0.5)
-            ax.set_xlabel('Return (%)')
-            ax.set_ylabel('Frequency')
-            ax.set_title('Return Distribution')
-            ax.grid(True, alpha=0.3)
-            plt.tight_layout()
+            # 2. 價格歷史圖
+            if price_history:
+                ax = fig.add_subplot(111)
+                arr = self._history_array(price_history)
+                prices = arr[:, 1]
+                idx = lttb_indices(arr[:, 0], prices, _plot_points(12, 150))
+                dates = arr[idx, 0].astype(np.int64).astype('datetime64[s]')
+                prices = prices[idx]
+                
+                ax.plot(dates, prices, linewidth=1.5, color='green', alpha=0.7, label='WBTC/USDC Price')
+                ax.set_xlabel('Date')
+                ax.set_ylabel('Price (USDC)')
+                ax.set_title('WBTC/USDC Price Over Time')
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+                ax.tick_params(axis='x', labelrotation=45)
+                
+                filepath = self.output_dir / f"{prefix}_price_history.png"
+                fig.savefig(filepath, dpi=150, bbox_inches='tight')
+                fig.clf()
+                filepaths.append(str(filepath))
             
-            filepath = self.output_dir / f"{prefix}_return_distribution.png"
-            plt.savefig(filepath, dpi=150, bbox_inches='tight')
-            plt.close()
-            filepaths.append(str(filepath))
+            # 3. 收益率分佈圖
+            if metrics.return_history:
+                fig.set_size_inches(10, 6)
+                ax = fig.add_subplot(111)
+                ax.hist(metrics.return_history, bins=50, alpha=0.7, edgecolor='black')
+                ax.axvline(x=0, color='r', linestyle='--', alpha=0.5)
+                ax.set_xlabel('Return (%)')
+                ax.set_ylabel('Frequency')
+                ax.set_title('Return Distribution')
+                ax.grid(True, alpha=0.3)
+                
+                filepath = self.output_dir / f"{prefix}_return_distribution.png"
+                fig.savefig(filepath, dpi=150, bbox_inches='tight')
+                filepaths.append(str(filepath))
+        finally:
+            plt.close(fig)
         
         # 4. 價格與 ATR 範圍疊圖（如果提供了 ATR 數據）
         if atr_range_history and price_history:
@@ -236,24 +350,21 @@ class OutputGenerator:
         if not price_history or not atr_range_history:
             return ""
         
-        try:
-            import matplotlib
-            matplotlib.use('Agg')  # 非交互式後端
-            import matplotlib.pyplot as plt
-            import matplotlib.dates as mdates
-            from datetime import datetime
-            import numpy as np
-            from matplotlib.patches import Rectangle
-        except ImportError:
+        mpl = _load_matplotlib()
+        if mpl is None:
             print("警告：matplotlib 未安裝，無法生成圖表")
             return ""
+        plt, mdates, np = mpl
         
         # 創建圖表，使用更大的尺寸
-        fig = plt.figure(figsize=(18, 10))
+        fig = plt.figure(figsize=(18, 10), layout='constrained')
         fig.patch.set_facecolor('#ffffff')
         
         # 創建網格佈局：頂部指標 + 主圖表
-        gs = fig.add_gridspec(2, 1, height_ratios=[1, 5], hspace=0.3)
+        # constrained 佈局把 gridspec 的 hspace 解釋為整個圖高的比例，不再設置 hspace；
+        # 面板間距由佈局引擎的 h_pad 控制（與原先 tight_layout 的默認間距相近，主圖標題另計）
+        fig.get_layout_engine().set(h_pad=0.05, hspace=0)
+        gs = fig.add_gridspec(2, 1, height_ratios=[1, 5])
         
         # 頂部指標面板
         metrics_ax = fig.add_subplot(gs[0])
@@ -343,18 +454,21 @@ class OutputGenerator:
         ax = fig.add_subplot(gs[1])
         ax.set_facecolor('#fafafa')
         
-        # 提取價格歷史數據
-        timestamps = [ts for ts, _ in price_history]
-        prices = [p for _, p in price_history]
-        dates = [datetime.fromtimestamp(ts) for ts in timestamps]
-        
-        # 提取 ATR 範圍歷史數據
-        atr_timestamps = [ts for ts, _, _, _, _ in atr_range_history]
-        atr_prices = [p for _, p, _, _, _ in atr_range_history]
-        atr_values = [atr for _, _, atr, _, _ in atr_range_history]
-        atr_lower_list = [lower for _, _, _, lower, _ in atr_range_history]
-        atr_upper_list = [upper for _, _, _, _, upper in atr_range_history]
-        atr_dates = [datetime.fromtimestamp(ts) for ts in atr_timestamps]
+        # 提取價格歷史數據（datetime64 由 matplotlib 直接轉換）
+        # 長序列先以 LTTB 降采樣到約 4 倍像素寬度的點數
+        max_points = _plot_points(18, self.atr_plot_dpi)
+        price_arr = self._history_array(price_history)
+        price_arr = price_arr[lttb_indices(price_arr[:, 0], price_arr[:, 1], max_points)]
+        timestamps = price_arr[:, 0].astype(np.int64)
+        prices = price_arr[:, 1]
+        dates = timestamps.astype('datetime64[s]')
+        
+        # 提取 ATR 範圍歷史數據: (timestamp, price, atr, lower, upper)，上下界共用按價格選出的索引
+        atr_arr = self._history_array(atr_range_history)
+        atr_arr = atr_arr[lttb_indices(atr_arr[:, 0], atr_arr[:, 1], max_points)]
+        atr_dates = atr_arr[:, 0].astype(np.int64).astype('datetime64[s]')
+        atr_lower_list = atr_arr[:, 3]
+        atr_upper_list = atr_arr[:, 4]
         
         # 繪製 ATR 範圍（淺紫色陰影）
         ax.fill_between(
@@ -364,27 +478,28 @@ class OutputGenerator:
             alpha=0.25,
             color='#9b87f5',  # 淺紫色
             label='Price Range (Upper/Lower)',
-            zorder=1
+            zorder=1,
+            rasterized=True
         )
         
         # 繪製 Upper 和 Lower 線
         ax.plot(atr_dates, atr_upper_list, color='#7c6cf0', linewidth=1.5, alpha=0.6, 
-                label='Upper', linestyle='-', zorder=2)
+                label='Upper', linestyle='-', zorder=2, rasterized=True)
         ax.plot(atr_dates, atr_lower_list, color='#7c6cf0', linewidth=1.5, alpha=0.6, 
-                label='Lower', linestyle='-', zorder=2)
+                label='Lower', linestyle='-', zorder=2, rasterized=True)
         
         # 繪製當前價格線（藍色實線）
         ax.plot(dates, prices, color='#3b82f6', linewidth=2.5, label='Price', 
-                alpha=0.9, zorder=3)
+                alpha=0.9, zorder=3, rasterized=True)
         
         # 標記 rebalance 點（如果有）
         if rebalance_history:
-            for reb_ts, reb_price, reb_lower, reb_upper in rebalance_history:
-                reb_date = datetime.fromtimestamp(reb_ts)
-                # 在價格線上標記 rebalance 點
-                ax.scatter(reb_date, reb_price, color='#f59e0b', s=100, 
-                          marker='v', zorder=4, edgecolors='white', linewidths=2,
-                          label='Rebalance' if reb_ts == rebalance_history[0][0] else '')
+            # 在價格線上標記 rebalance 點（一次 scatter 繪製全部）
+            reb_arr = np.asarray(rebalance_history, dtype=np.float64)
+            reb_dates = reb_arr[:, 0].astype(np.int64).astype('datetime64[s]')
+            ax.scatter(reb_dates, reb_arr[:, 1], color='#f59e0b', s=100, 
+                      marker='v', zorder=4, edgecolors='white', linewidths=2,
+                      label='Rebalance')
         
         # 設置標籤和標題
         ax.set_xlabel('Time', fontsize=13, fontweight='500', color='#374151')
@@ -406,7 +521,7 @@ class OutputGenerator:
         
         # 根據數據範圍設置合適的 locator（避免生成過多 ticks）
         if len(dates) > 0:
-            date_range = (dates[-1] - dates[0]).days
+            date_range = int(timestamps[-1] - timestamps[0]) // 86400
             if date_range > 365:
                 # 超過一年，使用月份
                 ax.xaxis.set_major_locator(mdates.MonthLocator(interval=max(1, date_range // 365)))
@@ -430,12 +545,10 @@ class OutputGenerator:
             spine.set_edgecolor('#e5e7eb')
             spine.set_linewidth(0.5)
         
-        # 調整佈局
-        plt.tight_layout()
-        
         # 保存圖表
         filepath = self.output_dir / f"{prefix}_price_atr_range.png"
-        plt.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none')
+        plt.savefig(filepath, dpi=self.atr_plot_dpi, bbox_inches='tight', facecolor='white', edgecolor='none',
+                    pil_kwargs={'compress_level': 1, 'optimize': False})
         plt.close()
         
         return str(filepath)
\ No newline at end of file
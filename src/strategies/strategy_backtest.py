@@ -8,6 +8,7 @@ Unified framework for backtesting and comparing different AMM strategies:
 """
 
 import csv
+from array import array
 from decimal import Decimal
 from typing import List, Dict, Any, Tuple, Optional
 from dataclasses import dataclass, field
@@ -51,6 +52,10 @@ class BacktestResult:
     impermanent_loss_pct: float
     time_in_range_pct: float
     value_history: List[Tuple[int, Decimal]] = field(default_factory=list)
+    # Float copy of value_history as compact columns, for numeric consumers
+    # (IL analysis, charts) that don't need Decimal precision
+    value_timestamps: array = field(default_factory=lambda: array('q'))
+    value_history_f64: array = field(default_factory=lambda: array('d'))
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -291,7 +296,9 @@ class StrategyBacktester:
             total_swap_cost=strategy.metrics.total_swap_cost,
             impermanent_loss_pct=il_pct,
             time_in_range_pct=time_in_range_pct,
-            value_history=value_history
+            value_history=value_history,
+            value_timestamps=array('q', (ts for ts, _ in value_history)),
+            value_history_f64=array('d', (float(v) for _, v in value_history))
         )
     
     def compare_strategies(
@@ -14,10 +14,7 @@ Uniswap V3 數學計算模組
 - 由於 decimals 差異，display_price = on_chain_price * 10^(8-6) = on_chain_price * 100
 """
 import math
-from decimal import Decimal, getcontext
-
-# 設置高精度計算
-getcontext().prec = 50
+from functools import lru_cache
 
 Q96 = 2 ** 96
 Q128 = 2 ** 128
@@ -27,52 +24,78 @@ TOKEN0_DECIMALS = 8  # WBTC
 TOKEN1_DECIMALS = 6  # USDC
 PRICE_SCALE = 10 ** (TOKEN0_DECIMALS - TOKEN1_DECIMALS)  # 10^2 = 100
 
+# Uniswap V3 tick 邊界
+MIN_TICK = -887272
+MAX_TICK = 887272
+
+_HALF_LOG_1_0001 = math.log(1.0001) / 2.0
+
 
+@lru_cache(maxsize=65536)
 def tick_to_sqrt_price(tick: int) -> float:
     """將 tick 轉換為 sqrt price（用於流動性計算）
     
     返回: sqrt(1.0001^tick)
     
     這與 sqrtPriceX96 / 2^96 的值一致
-    """
-    MAX_TICK = 887272
-    MIN_TICK = -887272
     
+    回測中同一組 tick 邊界會被反覆查詢，因此結果以 LRU 快取。
+    """
     if tick > MAX_TICK:
         return 1e15
     elif tick < MIN_TICK:
         return 1e-15
     
-    try:
-        # 使用對數計算避免溢出
-        # sqrt(1.0001^tick) = exp(tick * ln(1.0001) / 2)
-        log_base = math.log(1.0001)
-        half_tick_log = tick * log_base / 2.0
-        
-        if abs(half_tick_log) > 700:
-            raise OverflowError("Tick too large")
-        
-        sqrt_price = math.exp(half_tick_log)
-        
-        if math.isinf(sqrt_price) or math.isnan(sqrt_price):
-            raise OverflowError("Result is inf or nan")
-        
-        return sqrt_price
-        
-    except (OverflowError, ValueError):
-        try:
-            getcontext().Emax = 999999999
-            getcontext().Emin = -999999999
-            
-            price_decimal = Decimal('1.0001') ** Decimal(tick)
-            sqrt_price = float(price_decimal.sqrt())
-            
-            if math.isinf(sqrt_price) or math.isnan(sqrt_price):
-                raise OverflowError("Decimal result is inf or nan")
-            
-            return sqrt_price
-        except:
-            return 1e15 if tick > 0 else 1e-15
+    # 使用對數計算：sqrt(1.0001^tick) = exp(tick * ln(1.0001) / 2)
+    # |tick| <= MAX_TICK 時指數最大約 ±44.4，float 不會溢出，無需 Decimal 後備
+    return math.exp(tick * _HALF_LOG_1_0001)
+
+
+# TickMath.getSqrtRatioAtTick 的 Q128.128 常數：第 i 項為 1/sqrt(1.0001^(2^i))
+_SQRT_RATIO_FACTORS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+_MAX_UINT256 = (1 << 256) - 1
+
+
+@lru_cache(maxsize=65536)
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    """tick → sqrtPriceX96（Q64.96 整數），與 TickMath.getSqrtRatioAtTick 逐位一致
+    
+    按 |tick| 的各個二進制位連乘預計算的 Q128.128 常數，只用整數乘法和移位。
+    """
+    abs_tick = -tick if tick < 0 else tick
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"tick 超出範圍: {tick}")
+    
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 1 << 128
+    for bit, factor in _SQRT_RATIO_FACTORS:
+        if abs_tick & bit:
+            ratio = (ratio * factor) >> 128
+    
+    if tick > 0:
+        ratio = _MAX_UINT256 // ratio
+    
+    # Q128.128 → Q64.96，向上取整
+    return (ratio >> 32) + (1 if ratio & 0xffffffff else 0)
 
 
 def sqrt_price_to_price(sqrt_price: float) -> float:
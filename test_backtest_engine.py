@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+回測引擎測試：固定區間批量主循環與逐行處理的一致性
+
+運行: python -m unittest test_backtest_engine
+"""
+import json
+import math
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加 src 目錄到路徑
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from backtest_engine import BacktestEngine
+from event_processor import SWAP
+
+
+def _write_oscillating_swaps(path, num_swaps=3000, seed=11):
+    """價格在初始價格 ±8% 間擺動的 Swap 序列，反覆離開並回到 ±3% 的固定區間
+
+    池子流動性取得較小，使每筆 swap 的手續費都觸及單次結算上限。
+    """
+    rng = random.Random(seed)
+    ts = 1_700_000_000
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(num_swaps):
+            price = 60000.0 * math.exp(0.08 * math.sin(i / 150.0) + rng.gauss(0, 0.002))
+            raw = price / 100
+            tick = int(math.floor(math.log(raw) / math.log(1.0001)))
+            amount0 = rng.randint(10 ** 5, 10 ** 8)
+            amount1 = -int(amount0 / 1e8 * price * 1e6)
+            if rng.random() < 0.5:
+                amount0, amount1 = -amount0, -amount1
+            ts += rng.randint(1, 30)
+            f.write(json.dumps({
+                'eventType': 'Swap', 'blockTimestamp': ts, 'blockNumber': 18_000_000 + i,
+                'logIndex': 0, 'sqrtPriceX96': int(math.sqrt(raw) * 2 ** 96), 'tick': tick,
+                'liquidity': rng.randint(10 ** 12, 10 ** 13),
+                'amount0': amount0, 'amount1': amount1
+            }) + '\n')
+
+
+class _PerRowEngine(BacktestEngine):
+    """固定區間主循環的逐行參考實現：每行處理 Swap，每 100 行估值一次"""
+
+    def _run_loop_fixed(self, batch):
+        event_types = batch.event_types
+        for i in range(len(batch)):
+            if event_types[i] == SWAP:
+                self._process_swap_at(batch, i)
+            if i % 100 == 0:
+                current_price = self.amm.get_current_price()
+                if current_price > 0:
+                    value = self._calculate_portfolio_value(current_price)
+                    self.value_timestamps.append(batch.timestamps[i])
+                    self.value_values.append(value)
+                    self.current_value = value
+        return event_types.count(SWAP), 0, 0
+
+
+class FixedRangeLoopTest(unittest.TestCase):
+    def test_batched_loop_matches_per_row_valuation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / 'swaps.jsonl'
+            _write_oscillating_swaps(data)
+
+            results = []
+            for engine_cls in (BacktestEngine, _PerRowEngine):
+                engine = engine_cls(str(data), initial_capital=10000.0)
+                engine.event_processor.use_cache = False
+                engine.run_backtest(verbose=False, price_range_pct=0.03)
+                results.append((engine.get_value_history(), engine.get_total_fees_earned()))
+
+        (batched, batched_fees), (per_row, per_row_fees) = results
+        self.assertEqual(batched, per_row)
+        self.assertEqual(batched_fees, per_row_fees)
+        self.assertGreater(batched_fees, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+事件處理器測試：解析緩存的失效、列式批次與分塊解析
+
+運行: python -m unittest test_event_processor
+"""
+import json
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# 添加 src 目錄到路徑
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import event_processor
+from event_processor import (
+    EventBatch, EventProcessor, SWAP, MINT, BURN, OTHER,
+    _chunk_boundaries, _parse_chunk,
+)
+
+
+def _swap(ts, block, log, tick=100, price_x96=2 ** 96):
+    return {
+        'eventType': 'Swap', 'blockTimestamp': ts, 'blockNumber': block, 'logIndex': log,
+        'sqrtPriceX96': price_x96, 'tick': tick, 'liquidity': 10 ** 18,
+        'amount0': -5, 'amount1': 7
+    }
+
+
+def _mint(ts, block, log):
+    return {
+        'eventType': 'Mint', 'blockTimestamp': ts, 'blockNumber': block, 'logIndex': log,
+        'tickLower': -60, 'tickUpper': 60, 'amount': 1000
+    }
+
+
+def _write_jsonl(path, events):
+    with open(path, 'w', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event) + '\n')
+
+
+class EventCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.data = self.dir / 'events.jsonl'
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_cache_roundtrip(self):
+        events = [_swap(20, 2, 0), _mint(10, 1, 0), _swap(10, 1, 1)]
+        _write_jsonl(self.data, events)
+
+        first = list(EventProcessor(str(self.data)).read_events())
+        self.assertTrue(EventProcessor(str(self.data)).cache_path.exists())
+        second = list(EventProcessor(str(self.data)).read_events())
+
+        expected = [events[1], events[2], events[0]]
+        self.assertEqual(first, expected)
+        self.assertEqual(second, expected)
+
+    def test_cache_holds_columns_not_event_dicts(self):
+        events = [_swap(10, 1, 0), _mint(11, 2, 0)]
+        _write_jsonl(self.data, events)
+        processor = EventProcessor(str(self.data))
+        processor.get_event_batch()
+
+        with open(processor.cache_path, 'rb') as f:
+            pickle.load(f)
+            payload = pickle.load(f)
+        self.assertEqual(set(payload), {'columns', 'offsets', 'stats'})
+
+    def test_events_rebuilt_on_demand_from_cache(self):
+        events = [_mint(30, 3, 0), _swap(10, 1, 0), _swap(20, 2, 0)]
+        events[1]['transactionHash'] = '0xabc'
+        _write_jsonl(self.data, events)
+        # 第一次構建緩存，第二次從緩存載入
+        list(EventProcessor(str(self.data)).read_events())
+        processor = EventProcessor(str(self.data))
+
+        self.assertEqual(list(processor.read_events()), [events[1], events[2], events[0]])
+        self.assertEqual(
+            list(processor.get_events_in_range(start_timestamp=15, end_timestamp=30)),
+            [events[2], events[0]]
+        )
+        self.assertEqual(processor.get_event_statistics()['by_type'], {'Swap': 2, 'Mint': 1})
+
+    def test_cache_invalidated_by_replacement_with_older_mtime(self):
+        _write_jsonl(self.data, [_swap(10, 1, 0, tick=1)])
+        list(EventProcessor(str(self.data)).read_events())
+
+        # 模擬 cp -p / rsync -t：換入內容不同、mtime 更舊的文件
+        replacement = self.dir / 'replacement.jsonl'
+        _write_jsonl(replacement, [_swap(10, 1, 0, tick=2)])
+        old = self.data.stat().st_mtime_ns - 10 ** 10
+        os.utime(replacement, ns=(old, old))
+        os.replace(replacement, self.data)
+
+        events = list(EventProcessor(str(self.data)).read_events())
+        self.assertEqual(events, [_swap(10, 1, 0, tick=2)])
+
+    def test_cache_invalidated_by_same_size_rewrite(self):
+        _write_jsonl(self.data, [_swap(10, 1, 0, tick=1)])
+        list(EventProcessor(str(self.data)).read_events())
+        mtime = self.data.stat().st_mtime_ns
+
+        # 大小和 mtime 都不變，只有內容不同：由首尾塊哈希識別
+        _write_jsonl(self.data, [_swap(10, 1, 0, tick=2)])
+        os.utime(self.data, ns=(mtime, mtime))
+
+        events = list(EventProcessor(str(self.data)).read_events())
+        self.assertEqual(events, [_swap(10, 1, 0, tick=2)])
+
+    def test_corrupt_cache_is_ignored(self):
+        events = [_swap(10, 1, 0)]
+        _write_jsonl(self.data, events)
+        processor = EventProcessor(str(self.data))
+        processor.cache_path.write_bytes(b'not a pickle')
+
+        self.assertEqual(list(processor.read_events()), events)
+
+    def test_non_object_lines_are_skipped(self):
+        events = [_swap(10, 1, 0), _swap(11, 2, 0)]
+        with open(self.data, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(events[0]) + '\n[1, 2]\n"Swap"\nnull\n{bad json\n')
+            f.write(json.dumps(events[1]) + '\n')
+
+        for use_cache in (True, False):
+            with mock.patch('builtins.print') as printed:
+                parsed = list(EventProcessor(str(self.data), use_cache=use_cache).read_events())
+            self.assertEqual(parsed, events)
+            messages = [call.args[0] for call in printed.call_args_list]
+            self.assertEqual(sum(m.startswith('Error parsing line') for m in messages), 4)
+
+
+class EventBatchTest(unittest.TestCase):
+    def test_from_events_columns(self):
+        events = [
+            _swap(10, 1, 0, price_x96=2 ** 100),
+            _mint(11, 2, 0),
+            {'eventType': 'Burn', 'blockTimestamp': 12, 'blockNumber': 3, 'logIndex': 0},
+            {'eventType': 'Collect', 'blockTimestamp': 13, 'blockNumber': 4, 'logIndex': 0},
+            _swap(14, 5, 0, tick=None),
+        ]
+        batch = EventBatch.from_events(iter(events))
+
+        self.assertEqual(len(batch), 5)
+        self.assertEqual(list(batch.event_types), [SWAP, MINT, BURN, OTHER, SWAP])
+        self.assertEqual(list(batch.timestamps), [10, 11, 12, 13, 14])
+        self.assertEqual(batch.sqrt_prices_x96[0], 2 ** 100)
+        # tick 為 None 的 Swap：tick 和 sqrtPriceX96 都記為 0
+        self.assertEqual(batch.ticks[4], 0)
+        self.assertEqual(batch.sqrt_prices_x96[4], 0)
+
+    def test_wide_int_column_falls_back_to_list(self):
+        wide = _swap(10, 1, 0)
+        wide['liquidity'] = 2 ** 70
+        batch = EventBatch.from_events([wide, _swap(11, 2, 0)])
+
+        self.assertIsInstance(batch.liquidities, list)
+        self.assertEqual(batch.liquidities[0], 2 ** 70)
+
+    def test_concat(self):
+        wide = _swap(12, 3, 0)
+        wide['liquidity'] = 2 ** 70
+        a = EventBatch.from_events([_swap(10, 1, 0), _swap(11, 2, 0)])
+        b = EventBatch.from_events([wide])
+        merged = EventBatch.concat([a, b])
+
+        self.assertEqual(list(merged.timestamps), [10, 11, 12])
+        self.assertEqual(merged.liquidities[2], 2 ** 70)
+        self.assertEqual(len(EventBatch.concat([])), 0)
+
+    def test_sort_rows_is_stable(self):
+        events = [_swap(20, 2, 0, tick=1), _swap(10, 1, 0, tick=2), _swap(10, 1, 0, tick=3)]
+        batch = EventBatch.from_events(events).sort_rows()
+
+        self.assertEqual(list(batch.ticks), [2, 3, 1])
+
+    def test_sort_rows_returns_self_when_sorted(self):
+        batch = EventBatch.from_events([_swap(10, 1, 0), _swap(10, 1, 1)])
+        self.assertIs(batch.sort_rows(), batch)
+
+    def test_take(self):
+        batch = EventBatch.from_events([_swap(ts, ts, 0) for ts in range(1, 6)])
+
+        self.assertIs(batch.take(range(len(batch))), batch)
+        self.assertEqual(list(batch.take(range(1, 3)).timestamps), [2, 3])
+        self.assertEqual(list(batch.take([4, 0]).timestamps), [5, 1])
+
+
+class ChunkedParseTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.data = Path(self._tmp.name) / 'events.jsonl'
+        self.events = [_swap(200 - ts, ts, ts % 3) for ts in range(200)]
+        _write_jsonl(self.data, self.events)
+        with open(self.data, 'a', encoding='utf-8') as f:
+            f.write('\n   \n')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_chunks_match_sequential_parse(self):
+        expected = EventProcessor(str(self.data), use_cache=False)._parse_all_columns()
+        size = self.data.stat().st_size
+        for num_chunks in (1, 2, 7, 64):
+            bounds = _chunk_boundaries(self.data, size, num_chunks)
+            self.assertEqual(bounds[0], 0)
+            self.assertEqual(bounds[-1], size)
+            chunks = [
+                _parse_chunk(str(self.data), start, end)
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ]
+            batch = EventBatch.concat([EventBatch(**columns) for columns, _, _ in chunks])
+            offsets = [offset for _, chunk_offsets, _ in chunks for offset in chunk_offsets]
+            self.assertEqual(batch.to_columns(), expected[0].to_columns())
+            self.assertEqual(offsets, list(expected[1]))
+
+    def test_parallel_cache_build(self):
+        with mock.patch.object(event_processor, '_PARALLEL_PARSE_MIN_BYTES', 0):
+            events = list(EventProcessor(str(self.data)).read_events())
+        self.assertEqual(events, self.events[::-1])
+
+
+if __name__ == '__main__':
+    unittest.main()